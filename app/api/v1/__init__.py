@@ -4,9 +4,13 @@ from .incidents.views import router as incidents_router
 from .events.views import router as events_router
 from .timelines.views import router as timelines_router
 from .logs.views import router as logs_router
+from .exports.views import router as exports_router
+from .stats.views import router as stats_router
 
 router = APIRouter()
 router.include_router(incidents_router)
 router.include_router(events_router)
 router.include_router(timelines_router)
 router.include_router(logs_router)
+router.include_router(exports_router)
+router.include_router(stats_router)
@@ -1,21 +1,24 @@
-from sqlalchemy import select
+from sqlalchemy import Row, Select, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .orm import Event
 
 
-async def get_events(
+def _events_stmt(stmt: Select, incident_iid: int | None, limit: int, offset: int) -> Select:
+    if incident_iid is not None:
+        stmt = stmt.where(Event.incident_iid == incident_iid)
+    return stmt.order_by(Event.start_time).limit(limit).offset(offset)
+
+
+async def get_event_rows(
     session: AsyncSession,
     incident_iid: int | None = None,
     limit: int = 50,
     offset: int = 0,
-) -> list[Event]:
-    stmt = select(Event)
-    if incident_iid is not None:
-        stmt = stmt.where(Event.incident_iid == incident_iid)
-    stmt = stmt.order_by(Event.start_time).limit(limit).offset(offset)
+) -> tuple[list[str], list[Row]]:
+    stmt = _events_stmt(select(*Event.__table__.columns), incident_iid, limit, offset)
     result = await session.execute(stmt)
-    return list(result.scalars().all())
+    return list(result.keys()), list(result.all())
 
 
 async def get_event(session: AsyncSession, event_iid: int) -> Event | None:
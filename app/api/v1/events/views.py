@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import db
-from app.utils.structures import Status, resp
+from app.utils.cache import response_cache
+from app.api.v1.incidents.crud import get_incident_status
+from app.utils.structures import Status, json_response, resp, resp_rows
 from . import crud
 from .schemas import Event as EventSchema
 
@@ -15,13 +17,23 @@ router = APIRouter(prefix="/events", tags=["Events"])
     description="Возвращает обнаруженные события. Используйте `?incident_iid=1` для фильтрации по конкретному видео.",
 )
 async def list_events(
-    session: AsyncSession = Depends(db.scoped_session_dependency),
+    request: Request,
+    session: AsyncSession = Depends(db.read_session_dependency),
     incident_iid: int | None = Query(default=None, description="Фильтр по инциденту"),
     limit: int = Query(default=50, ge=1, le=200),
     offset: int = Query(default=0, ge=0),
 ):
-    events = await crud.get_events(session, incident_iid=incident_iid, limit=limit, offset=offset)
-    return resp(Status.OK, [EventSchema.model_validate(e).model_dump() for e in events])
+    cache_key = f"events:{incident_iid}:{limit}:{offset}"
+    if incident_iid is not None and (cached := response_cache.get(cache_key)) is not None:
+        return cached.to_response(request)
+
+    # статус читаем до данных: если инцидент уже DONE, прочитанные строки окончательные
+    final = incident_iid is not None and await get_incident_status(session, incident_iid) == "DONE"
+    keys, rows = await crud.get_event_rows(session, incident_iid=incident_iid, limit=limit, offset=offset)
+    body = resp_rows(keys, rows)
+    if final:
+        return response_cache.put(cache_key, incident_iid, body).to_response(request)
+    return json_response(body)
 
 
 @router.get(
@@ -30,7 +42,7 @@ async def list_events(
 )
 async def get_event(
     event_iid: int,
-    session: AsyncSession = Depends(db.scoped_session_dependency),
+    session: AsyncSession = Depends(db.read_session_dependency),
 ):
     event = await crud.get_event(session, event_iid)
     if event is None:
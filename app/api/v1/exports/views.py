@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from app.config import settings
+from app.api.v1.base_model import Base
+from app.api.v1.events.orm import Event
+from app.api.v1.incidents.orm import Incident
+from app.api.v1.logs.orm import Log
+from app.api.v1.timelines.orm import Timeline
+from app.api.v1.services.export import EXPORT_FORMATS, parquet_available, stream_export
+
+router = APIRouter(prefix="/exports", tags=["Exports"])
+
+_TABLES: dict[str, type[Base]] = {"events": Event, "timelines": Timeline, "logs": Log}
+
+
+@router.get(
+    "/{table}",
+    summary="Потоковая выгрузка",
+    description=(
+        "Выгружает `events`, `timelines` или `logs` целиком или по фильтру одним потоком "
+        "в `ndjson`, `csv` или `parquet` (нужен `pyarrow`). Строки читаются серверным курсором пачками по `batch_size`, "
+        "`gzip=true` сжимает поток. Фильтры: `incident_iid` или диапазон `created_from`…`created_to` по дате создания инцидента."
+    ),
+)
+async def export_table(
+    table: str,
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv|parquet)$"),
+    incident_iid: int | None = Query(default=None, description="Фильтр по инциденту"),
+    created_from: datetime | None = Query(default=None, description="Инциденты, созданные не раньше"),
+    created_to: datetime | None = Query(default=None, description="Инциденты, созданные раньше"),
+    batch_size: int = Query(default=None, ge=1, le=100_000, description="Строк в пачке, по умолчанию EXPORT_BATCH_SIZE"),
+    gzip: bool = Query(default=False),
+):
+    model = _TABLES.get(table)
+    if model is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"unknown export table {table!r}")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="parquet export requires pyarrow")
+
+    stmt = select(*model.__table__.columns)
+    if incident_iid is not None:
+        stmt = stmt.where(model.incident_iid == incident_iid)
+    if created_from is not None or created_to is not None:
+        stmt = stmt.join(Incident, Incident.iid == model.incident_iid)
+        if created_from is not None:
+            stmt = stmt.where(Incident.created_at >= created_from)
+        if created_to is not None:
+            stmt = stmt.where(Incident.created_at < created_to)
+    stmt = stmt.order_by(model.iid)
+
+    filename = f"{table}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream_export(stmt, format, batch_size or settings.export_batch_size, gzip=gzip),
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
@@ -1,15 +1,20 @@
 import json
+import time
 from pathlib import Path
 
-from sqlalchemy import select
+from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .orm import Incident
 from app.api.v1.events.orm import Event
 from app.api.v1.timelines.orm import Timeline
 from app.api.v1.logs.orm import Log
+from app.api.v1.services.proxy import ensure_proxy
+from app.api.v1.services.reports import prerender_reports
+from app.api.v1.stats.crud import apply_incident_rollup
 from app.config import settings
 from app.database import db
+from app.utils.metrics import collect_stage_timings, stage_timer
 
 
 async def get_incidents(session: AsyncSession, limit: int, offset: int) -> list[Incident]:
@@ -22,6 +27,11 @@ async def get_incident(session: AsyncSession, incident_iid: int) -> Incident | N
     return await session.get(Incident, incident_iid)
 
 
+async def get_incident_status(session: AsyncSession, incident_iid: int) -> str | None:
+    result = await session.execute(select(Incident.status).where(Incident.iid == incident_iid))
+    return result.scalar_one_or_none()
+
+
 async def create_incident(
     session: AsyncSession,
     video_link: str,
@@ -42,6 +52,28 @@ async def create_incident(
     return incident
 
 
+async def create_incidents(
+    session: AsyncSession,
+    count: int,
+    domain: str = "AUTO",
+) -> list[Incident]:
+    incidents = [
+        Incident(
+            video_link="saving...",
+            status="PENDING",
+            inferred_domain=domain,
+            has_event=False,
+            duration_sec=0.0,
+            num_frames=0,
+            num_windows=0,
+        )
+        for _ in range(count)
+    ]
+    session.add_all(incidents)
+    await session.commit()
+    return incidents
+
+
 async def update_incident(session: AsyncSession, incident: Incident, data: dict) -> Incident:
     for key, value in data.items():
         setattr(incident, key, value)
@@ -50,39 +82,70 @@ async def update_incident(session: AsyncSession, incident: Incident, data: dict)
     return incident
 
 
+async def claim_for_requeue(session: AsyncSession, incident_iid: int) -> Incident | None:
+    """
+    Атомарно переводит инцидент из `PARTIAL` в `PROCESSING`; `None`, если его уже забрал другой запрос.
+    """
+    result = await session.execute(
+        update(Incident)
+        .where(Incident.iid == incident_iid, Incident.status == "PARTIAL")
+        .values(status="PROCESSING")
+    )
+    await session.commit()
+    if result.rowcount != 1:
+        return None
+    return await session.get(Incident, incident_iid, populate_existing=True)
+
+
+def _timeline_row(incident_iid: int, w: dict) -> Timeline:
+    return Timeline(
+        incident_iid=incident_iid,
+        window_idx=w["window_idx"],
+        timestamp_sec=w["timestamp_sec"],
+        interval_end_sec=w.get("interval_end_sec"),
+        label=w.get("label") or "",
+        has_event=w.get("has_event", False),
+        caption=w.get("caption", ""),
+        risk_score=w.get("risk_score", 0.0),
+        event_type=w.get("event_type", ""),
+        domain_scores=w.get("domain_scores"),
+    )
+
+
+def _event_row(incident_iid: int, e: dict) -> Event:
+    return Event(
+        incident_iid=incident_iid,
+        event_type=e["event_type"],
+        start_time=e["interval_start_sec"],
+        end_time=e["interval_end_sec"],
+        confidence=e.get("confidence", 1.0),
+        description=e.get("description", ""),
+        highlight=f"{e['highlight_start_sec']}-{e['highlight_end_sec']}",
+    )
+
+
+async def save_timeline_windows(session: AsyncSession, incident_iid: int, windows: list[dict]) -> None:
+    session.add_all([_timeline_row(incident_iid, w) for w in windows])
+    await session.commit()
+
+
 async def save_analysis_results(
     session: AsyncSession,
     incident: Incident,
     llm_result: dict,
+    processing_sec: float | None = None,
 ) -> None:
     metadata = llm_result.get("metadata") or {}
+    await apply_incident_rollup(session, incident, sign=-1)
 
-    for w in llm_result.get("timeline", []):
-        session.add(Timeline(
-            incident_iid=incident.iid,
-            window_idx=w["window_idx"],
-            timestamp_sec=w["timestamp_sec"],
-            interval_end_sec=w.get("interval_end_sec"),
-            label=w.get("label") or "",
-            has_event=w.get("has_event", False),
-            caption=w.get("caption", ""),
-            risk_score=w.get("risk_score", 0.0),
-            event_type=w.get("event_type", ""),
-        ))
-
-    for e in llm_result.get("events", []):
-        session.add(Event(
-            incident_iid=incident.iid,
-            event_type=e["event_type"],
-            start_time=e["interval_start_sec"],
-            end_time=e["interval_end_sec"],
-            confidence=1.0,
-            description=e.get("description", ""),
-            highlight=f"{e['highlight_start_sec']}-{e['highlight_end_sec']}",
-        ))
+    if not llm_result.pop("timeline_persisted", False):
+        await session.execute(delete(Timeline).where(Timeline.incident_iid == incident.iid))
+        session.add_all([_timeline_row(incident.iid, w) for w in llm_result.get("timeline", [])])
+
+    session.add_all([_event_row(incident.iid, e) for e in llm_result.get("events", [])])
 
     for key, value in {
-        "status": "DONE",
+        "status": "PARTIAL" if llm_result.get("missing_windows") else "DONE",
         "has_event": llm_result.get("has_event", False),
         "inferred_domain": llm_result.get("inferred_domain", "unknown"),
         "duration_sec": float(metadata.get("duration_sec") or 0),
@@ -91,24 +154,98 @@ async def save_analysis_results(
         "model_version": settings.model_version,
         "prompt_version": settings.prompt_version,
         "analysis_json": json.dumps(llm_result, ensure_ascii=False),
+        "processing_sec": processing_sec,
     }.items():
         setattr(incident, key, value)
 
+    await apply_incident_rollup(session, incident)
     await session.commit()
 
 
-async def write_log(session: AsyncSession, incident_iid: int, event: str = "UPD") -> Log:
+async def merge_recovered_windows(
+    session: AsyncSession,
+    incident: Incident,
+    previous: dict,
+    recovered: dict,
+) -> None:
+    from app.api.v1.services.consolidation import (
+        consolidate_events, consolidate_multi_domain, domain_profile, infer_domain, timeline_domains,
+    )
+
+    await apply_incident_rollup(session, incident, sign=-1)
+
+    previous["timeline"] = sorted(
+        previous.get("timeline", []) + recovered.get("timeline", []),
+        key=lambda w: w["window_idx"],
+    )
+    # события пересчитываются по полному таймлайну: восстановленные окна могут склеить соседние
+    domains = timeline_domains(previous["timeline"])
+    if domains:
+        profile = domain_profile(previous["timeline"], domains)
+        previous["inferred_domain"] = incident.inferred_domain = infer_domain(profile)
+        previous.setdefault("metadata", {})["domain_scores"] = profile
+        previous["events"] = consolidate_multi_domain(previous["timeline"], domains)
+    else:
+        domain = previous.get("inferred_domain")
+        previous["events"] = consolidate_events(previous["timeline"], domain if domain not in (None, "other") else "event")
+    await session.execute(delete(Event).where(Event.incident_iid == incident.iid))
+    session.add_all([_event_row(incident.iid, e) for e in previous["events"]])
+    previous["missing_windows"] = recovered.get("missing_windows", [])
+    previous["status"] = recovered.get("status", "completed")
+    previous["has_event"] = bool(previous["events"])
+
+    incident.status = "PARTIAL" if previous["missing_windows"] else "DONE"
+    incident.has_event = previous["has_event"]
+    incident.analysis_json = json.dumps(previous, ensure_ascii=False)
+    await apply_incident_rollup(session, incident)
+    await session.commit()
+
+
+async def write_log(
+    session: AsyncSession,
+    incident_iid: int,
+    event: str = "UPD",
+    duration_sec: float | None = None,
+) -> Log:
     log = Log(
         incident_iid=incident_iid,
         event=event,
         model_version=settings.model_version,
         prompt_version=settings.prompt_version,
+        duration_sec=duration_sec,
     )
     session.add(log)
     await session.commit()
     return log
 
 
+async def write_logs(session: AsyncSession, incident_iids: list[int], event: str = "UPD") -> None:
+    session.add_all([
+        Log(
+            incident_iid=incident_iid,
+            event=event,
+            model_version=settings.model_version,
+            prompt_version=settings.prompt_version,
+        )
+        for incident_iid in incident_iids
+    ])
+    await session.commit()
+
+
+async def write_stage_logs(session: AsyncSession, incident_iid: int, timings: list[tuple[str, float]]) -> None:
+    session.add_all([
+        Log(
+            incident_iid=incident_iid,
+            event=stage.upper(),
+            model_version=settings.model_version,
+            prompt_version=settings.prompt_version,
+            duration_sec=round(elapsed, 3),
+        )
+        for stage, elapsed in timings
+    ])
+    await session.commit()
+
+
 async def get_incident_timelines(session: AsyncSession, incident_iid: int) -> list[Timeline]:
     stmt = (
         select(Timeline)
@@ -119,6 +256,24 @@ async def get_incident_timelines(session: AsyncSession, incident_iid: int) -> li
     return list(result.scalars().all())
 
 
+def _persist_windows_callback(incident_iid: int, progress_store: dict):
+    windows_done = 0
+
+    async def on_windows(windows: list[dict], windows_total: int) -> None:
+        nonlocal windows_done
+        async with db.session_factory() as session:
+            await save_timeline_windows(session, incident_iid, windows)
+        windows_done += len(windows)
+        progress_store[incident_iid] = {
+            **progress_store.get(incident_iid, {}),
+            "windows_done": windows_done,
+            "windows_total": windows_total,
+            "partial": sorted(windows, key=lambda w: w["window_idx"]),
+        }
+
+    return on_windows
+
+
 async def process_incident_with_llm(
     incident_iid: int,
     file_path: str,
@@ -128,6 +283,7 @@ async def process_incident_with_llm(
     from app.api.v1.services import llm_client
 
     progress_store[incident_iid] = {"status": "PROCESSING"}
+    started = time.monotonic()
 
     async with db.session_factory() as session:
         incident = await session.get(Incident, incident_iid)
@@ -135,29 +291,99 @@ async def process_incident_with_llm(
         await session.commit()
         await write_log(session, incident_iid, "PROCESSING_START")
 
-    try:
-        result = await llm_client.analyze_video(
-            Path(file_path), domain=domain,
-            _progress=progress_store, _iid=incident_iid,
-        )
+    with collect_stage_timings() as timings:
+        try:
+            analysis_path = await ensure_proxy(incident_iid, Path(file_path))
+            result = await llm_client.analyze_video(
+                analysis_path, domain=domain,
+                _progress=progress_store, _iid=incident_iid,
+                _on_windows=_persist_windows_callback(incident_iid, progress_store),
+                source_path=Path(file_path),
+            )
 
-        async with db.session_factory() as session:
-            incident = await session.get(Incident, incident_iid)
-            await save_analysis_results(session, incident, result)
-            await write_log(session, incident_iid, "DONE")
+            async with db.session_factory() as session:
+                incident = await session.get(Incident, incident_iid)
+                with stage_timer("save_results"):
+                    await save_analysis_results(session, incident, result, processing_sec=round(time.monotonic() - started, 3))
+                await write_stage_logs(session, incident_iid, timings)
+                await write_log(session, incident_iid, incident.status)
 
-        progress_store[incident_iid] = {
-            "status": "DONE",
-            "has_event": result.get("has_event", False),
-            "inferred_domain": result.get("inferred_domain", "unknown"),
-            "events_found": len(result.get("events", [])),
-        }
+            if incident.status == "DONE":
+                prerender_reports(incident_iid, incident.analysis_json, incident.video_link)
 
-    except Exception as exc:
-        async with db.session_factory() as session:
-            incident = await session.get(Incident, incident_iid)
-            incident.status = "ERROR"
-            await session.commit()
-            await write_log(session, incident_iid, "ERROR")
+            progress_store[incident_iid] = {
+                "status": incident.status,
+                "has_event": result.get("has_event", False),
+                "inferred_domain": result.get("inferred_domain", "unknown"),
+                "events_found": len(result.get("events", [])),
+                "missing_windows": len(result.get("missing_windows", [])),
+            }
+
+        except Exception as exc:
+            async with db.session_factory() as session:
+                incident = await session.get(Incident, incident_iid)
+                incident.status = "ERROR"
+                await session.commit()
+                await write_stage_logs(session, incident_iid, timings)
+                await write_log(session, incident_iid, "ERROR")
+
+            progress_store[incident_iid] = {"status": "ERROR", "error": str(exc)}
+
+
+async def requeue_missing_windows(
+    incident_iid: int,
+    file_path: str,
+    progress_store: dict,
+) -> None:
+    from app.api.v1.services.frame_analyzer import analyze_video_by_frames
+
+    progress_store[incident_iid] = {"status": "PROCESSING", "stage": 3, "stage_name": "Дозапуск пропущенных окон"}
+
+    async with db.session_factory() as session:
+        incident = await session.get(Incident, incident_iid)
+        previous = json.loads(incident.analysis_json)
+        incident.status = "PROCESSING"
+        await session.commit()
+        await write_log(session, incident_iid, "REQUEUE_START")
+
+    missing = {w["window_idx"] for w in previous.get("missing_windows", [])}
+    # мультидоменный прогон дозапускается так же, иначе у окон не будет оценок по доменам;
+    # "other" — это общий промпт без домена, как и в исходном прогоне
+    multi_domain = (previous.get("metadata") or {}).get("multi_domain")
+    inferred = previous.get("inferred_domain")
+    domain = None if multi_domain or inferred in (None, "other") else inferred
+
+    with collect_stage_timings() as timings:
+        try:
+            recovered = await analyze_video_by_frames(
+                await ensure_proxy(incident_iid, Path(file_path)),
+                domain=domain,
+                on_windows=_persist_windows_callback(incident_iid, progress_store),
+                only_windows=missing,
+            )
+
+            async with db.session_factory() as session:
+                incident = await session.get(Incident, incident_iid)
+                await merge_recovered_windows(session, incident, previous, recovered)
+                await write_stage_logs(session, incident_iid, timings)
+                await write_log(session, incident_iid, incident.status)
+
+            if incident.status == "DONE":
+                prerender_reports(incident_iid, incident.analysis_json, incident.video_link)
+
+            progress_store[incident_iid] = {
+                "status": incident.status,
+                "has_event": incident.has_event,
+                "recovered_windows": len(recovered.get("timeline", [])),
+                "missing_windows": len(previous["missing_windows"]),
+            }
+
+        except Exception as exc:
+            async with db.session_factory() as session:
+                incident = await session.get(Incident, incident_iid)
+                incident.status = "PARTIAL"
+                await session.commit()
+                await write_stage_logs(session, incident_iid, timings)
+                await write_log(session, incident_iid, "ERROR")
 
-        progress_store[incident_iid] = {"status": "ERROR", "error": str(exc)}
+            progress_store[incident_iid] = {"status": "PARTIAL", "error": str(exc)}
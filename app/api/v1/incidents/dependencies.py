@@ -21,3 +21,10 @@ async def incident_by_id(
         status_code=status.HTTP_404_NOT_FOUND,
         detail=f"incident {incident_iid} not found!",
     )
+
+
+async def read_incident_by_id(
+    incident_iid: Annotated[int, Path],
+    session: AsyncSession = Depends(db.read_session_dependency),
+) -> Incident:
+    return await incident_by_id(incident_iid=incident_iid, session=session)
@@ -16,6 +16,8 @@ class Incident(Base):
     model_version: Mapped[str] = mapped_column(String(50), default="")
     prompt_version: Mapped[str] = mapped_column(String(50), default="")
     analysis_json: Mapped[str | None] = mapped_column(Text, nullable=True)
+    processing_sec: Mapped[float | None] = mapped_column(Float, nullable=True)
+    media_tier: Mapped[str] = mapped_column(String(20), default="hot")
     created_at: Mapped[datetime] = mapped_column(
         server_default=func.now(),
         default=datetime.utcnow,
@@ -31,3 +31,5 @@ class Incident(IncidentBase):
     iid: int = Field(gt=0)
     created_at: datetime
     analysis_json: Optional[str] = None
+    processing_sec: Optional[float] = None
+    media_tier: str = "hot"
@@ -1,21 +1,33 @@
 import asyncio
 import json
+import uuid
+from collections import OrderedDict
 from pathlib import Path
+from urllib.parse import urlsplit
 
-from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Query, UploadFile, status
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Query, Request, UploadFile, status
 from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database import db
-from app.utils.structures import Status, resp
+from app.utils.cache import etag_matches, response_cache
+from app.utils.metrics import collect_stage_timings, stage_timer
+from app.utils.structures import Status, dumps, json_response, resp
 from . import crud, dependencies
 from .schemas import Incident as IncidentSchema
-from app.api.v1.services.upload import save_upload_file, validate_content_type
+from app.api.v1.services import reports
+from app.api.v1.services.proxy import proxy_path
+from app.api.v1.services.retention import owned_path, retention
+from app.api.v1.services.scheduler import scheduler
+from app.api.v1.stats.crud import apply_incident_rollup
+from app.api.v1.services.upload import resolve_ingest_path, save_upload_file, validate_content_type
 
 router = APIRouter(prefix="/incidents", tags=["Incidents"])
 
 _progress: dict[int, dict] = {}
+_batches: OrderedDict[str, dict] = OrderedDict()
+_MAX_BATCHES = 1000
 
 
 @router.get(
@@ -24,7 +36,7 @@ _progress: dict[int, dict] = {}
     description="Возвращает все инциденты с пагинацией, отсортированные от новых к старым.",
 )
 async def list_incidents(
-    session: AsyncSession = Depends(db.scoped_session_dependency),
+    session: AsyncSession = Depends(db.read_session_dependency),
     limit: int = Query(default=10, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
 ):
@@ -37,7 +49,7 @@ async def list_incidents(
     summary="SSE: стриминг статуса анализа",
     description=(
         "Server-Sent Events. Открывайте **до или сразу после** `POST /upload`. "
-        "Поток закрывается автоматически при статусе `DONE` или `ERROR`. "
+        "Поток закрывается автоматически при статусе `DONE`, `PARTIAL` или `ERROR`. "
         "Формат сообщений: `data: {\"status\": \"PROCESSING\", ...}`"
     ),
 )
@@ -49,7 +61,7 @@ async def stream_status(incident_iid: int):
             if state != last_state:
                 last_state = state.copy()
                 yield f"data: {json.dumps(state, ensure_ascii=False)}\n\n"
-            if state.get("status") in ("DONE", "ERROR"):
+            if state.get("status") in ("DONE", "PARTIAL", "ERROR"):
                 yield 'data: {"event": "close"}\n\n'
                 break
             await asyncio.sleep(1)
@@ -88,12 +100,14 @@ async def upload_video(
     suffix = Path(file.filename or "video.mp4").suffix or ".mp4"
     file_path = settings.media_dir / "videos" / f"{incident_iid}{suffix}"
 
-    await save_upload_file(file, file_path)
+    with collect_stage_timings() as timings, stage_timer("upload_write"):
+        await save_upload_file(file, file_path)
 
     await crud.update_incident(session, incident, {
         "video_link": str(file_path),
         "status": "SAVED",
     })
+    await crud.write_stage_logs(session, incident_iid, timings)
     await crud.write_log(session, incident_iid, "UPLOADED")
 
     _progress[incident_iid] = {"status": "SAVED"}
@@ -113,6 +127,224 @@ async def upload_video(
     })
 
 
+@router.post(
+    "/batch",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Пакетная загрузка видео",
+    description=(
+        "Принимает несколько видеофайлов (`files`) и/или пути к файлам на сервере (`paths`, "
+        "относительно каталога `INGEST_DIR`) и создаёт по инциденту на каждое видео. "
+        "Анализ ставится в общую очередь: задачи разных тенантов (`tenant`, по умолчанию — домен) "
+        "обрабатываются по очереди, число одновременных запросов к LLM ограничено глобально. "
+        "Прогресс пакета — `GET /batch/{batch_id}/status/stream`."
+    ),
+)
+async def upload_batch(
+    files: list[UploadFile] = File(default=[], description="Видеофайлы (mp4, avi, mov...)"),
+    paths: list[str] = Form(default=[], description="Пути к видео внутри INGEST_DIR"),
+    domain: str = Form(default=None, description="Домен: traffic | production | violence | other"),
+    tenant: str = Form(default=None, description="Ключ справедливого планирования (камера, площадка, клиент)"),
+    session: AsyncSession = Depends(db.scoped_session_dependency),
+):
+    total = len(files) + len(paths)
+    if total == 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No files or paths provided")
+    if total > settings.batch_max_files:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds maximum of {settings.batch_max_files} videos",
+        )
+    for file in files:
+        validate_content_type(file)
+    local_paths = [resolve_ingest_path(p, settings.ingest_dir) for p in paths]
+
+    incidents = await crud.create_incidents(session, total, domain=domain or "AUTO")
+
+    accepted: list[tuple[int, Path]] = []
+    for incident, file in zip(incidents, files):
+        suffix = Path(file.filename or "video.mp4").suffix or ".mp4"
+        file_path = settings.media_dir / "videos" / f"{incident.iid}{suffix}"
+        try:
+            with stage_timer("upload_write"):
+                await save_upload_file(file, file_path)
+        except HTTPException as exc:
+            incident.status = "ERROR"
+            _progress[incident.iid] = {"status": "ERROR", "error": exc.detail}
+            continue
+        accepted.append((incident.iid, file_path))
+    for incident, file_path in zip(incidents[len(files):], local_paths):
+        accepted.append((incident.iid, file_path))
+
+    links = dict(accepted)
+    for incident in incidents:
+        if incident.iid in links:
+            incident.video_link = str(links[incident.iid])
+            incident.status = "SAVED"
+    await session.commit()
+    await crud.write_logs(session, list(links), "UPLOADED")
+
+    batch_id = uuid.uuid4().hex
+    key = tenant or (domain or "auto").lower()
+    _batches[batch_id] = {"tenant": key, "incidents": [i.iid for i in incidents]}
+    while len(_batches) > _MAX_BATCHES:
+        _batches.popitem(last=False)
+
+    for incident_iid, file_path in accepted:
+        _progress[incident_iid] = {"status": "QUEUED"}
+        scheduler.submit(
+            key,
+            lambda incident_iid=incident_iid, file_path=file_path: crud.process_incident_with_llm(
+                incident_iid, str(file_path), domain, _progress,
+            ),
+        )
+
+    return resp(Status.OK, {
+        "batch_id": batch_id,
+        "incidents": [{"incident_iid": i.iid, "status": i.status} for i in incidents],
+        "stream_url": f"{settings.api_v1_prefix}/incidents/batch/{batch_id}/status/stream",
+    })
+
+
+@router.get(
+    "/batch/{batch_id}/status/stream",
+    summary="SSE: прогресс пакетного анализа",
+    description=(
+        "Server-Sent Events с агрегированным статусом пакета: число инцидентов по статусам "
+        "и доля завершённых. Поток закрывается, когда все инциденты пакета в `DONE`, `PARTIAL` или `ERROR`, "
+        "либо через 10 минут — тогда к нему нужно переподключиться. Хранятся последние 1000 пакетов."
+    ),
+)
+async def stream_batch_status(batch_id: str):
+    batch = _batches.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"batch {batch_id} not found!")
+
+    async def event_stream():
+        last_state = None
+        for _ in range(600):
+            counts: dict[str, int] = {}
+            for incident_iid in batch["incidents"]:
+                incident_status = _progress.get(incident_iid, {"status": "PENDING"})["status"]
+                counts[incident_status] = counts.get(incident_status, 0) + 1
+            total = len(batch["incidents"])
+            finished = counts.get("DONE", 0) + counts.get("PARTIAL", 0) + counts.get("ERROR", 0)
+            state = {
+                "batch_id": batch_id,
+                "total": total,
+                "finished": finished,
+                "progress": round(finished / total, 3),
+                "statuses": counts,
+                "queued": scheduler.pending().get(batch["tenant"], 0),
+            }
+            if state != last_state:
+                last_state = state
+                yield f"data: {json.dumps(state, ensure_ascii=False)}\n\n"
+            if finished == total:
+                yield 'data: {"event": "close"}\n\n'
+                break
+            await asyncio.sleep(1)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@router.post(
+    "/stream",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Подключить живой видеопоток",
+    description=(
+        "Создаёт инцидент со статусом `STREAMING` и непрерывно анализирует источник скользящими окнами "
+        "(`STREAM_WINDOW_SEC`). Окна и события записываются в `timelines`/`events` по мере анализа.\n\n"
+        "**Параметр `source`**: URL потока (схемы из `STREAM_ALLOWED_SCHEMES`, по умолчанию `rtsp`, `rtsps`, `http`, `https`), номер устройства (`0`) "
+        "или путь к файлу внутри `INGEST_DIR`. Файл по умолчанию воспроизводится в реальном "
+        "времени (`realtime=true`) и заменяет камеру для тестов.\n\n"
+        "Остановка — `POST /{incident_iid}/stream/stop`, прогресс — `GET /{incident_iid}/status/stream`."
+    ),
+)
+async def start_stream(
+    source: str = Form(..., description="rtsp://... | http://... | номер камеры | путь в INGEST_DIR"),
+    domain: str = Form(default=None, description="Домен: traffic | production | violence | other"),
+    realtime: bool = Form(default=True, description="Для файлов: воспроизводить со скоростью реального времени"),
+    session: AsyncSession = Depends(db.scoped_session_dependency),
+):
+    if "://" in source:
+        # file:// и прочие схемы FFmpeg обходят проверку INGEST_DIR
+        scheme = urlsplit(source).scheme.lower()
+        if scheme not in settings.stream_allowed_schemes:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"stream scheme {scheme!r} is not allowed, expected one of {settings.stream_allowed_schemes}",
+            )
+        capture_source = source
+    elif source.isdigit():
+        capture_source = int(source)
+    else:
+        capture_source = str(resolve_ingest_path(source, settings.ingest_dir))
+
+    incident = await crud.create_incident(session=session, video_link=str(capture_source), domain=domain or "AUTO")
+    await crud.update_incident(session, incident, {"status": "STREAMING"})
+    await crud.write_log(session, incident.iid, "STREAM_START")
+
+    from app.api.v1.services import stream_ingest
+
+    stream_ingest.start_stream(incident.iid, capture_source, domain, _progress, realtime=realtime)
+
+    return resp(Status.OK, {
+        "incident_iid": incident.iid,
+        "status": "STREAMING",
+        "stream_url": f"{settings.api_v1_prefix}/incidents/{incident.iid}/status/stream",
+    })
+
+
+@router.post(
+    "/{incident_iid}/stream/stop",
+    summary="Остановить анализ живого потока",
+    description="Останавливает чтение источника, дожидается анализа последних окон и переводит инцидент в `DONE`.",
+)
+async def stop_stream(incident_iid: int):
+    from app.api.v1.services import stream_ingest
+
+    if not stream_ingest.stop_stream(incident_iid):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"stream {incident_iid} not found!")
+    return resp(Status.OK, {"incident_iid": incident_iid, "status": "STOPPING"})
+
+
+@router.post(
+    "/{incident_iid}/requeue",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Дозапустить пропущенные окна",
+    description=(
+        "Для инцидента в статусе `PARTIAL` повторно анализирует только окна из `missing_windows` "
+        "(см. `analysis_json`) и дописывает результат в таймлайн и события. "
+        "Прогресс — `GET /{incident_iid}/status/stream`."
+    ),
+)
+async def requeue_incident(
+    incident_iid: int,
+    session: AsyncSession = Depends(db.scoped_session_dependency),
+):
+    incident = await crud.claim_for_requeue(session, incident_iid)
+    if incident is None:
+        current = await crud.get_incident_status(session, incident_iid)
+        if current is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"incident {incident_iid} not found!")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"incident {incident_iid} is {current}, only PARTIAL can be requeued",
+        )
+    missing = json.loads(incident.analysis_json).get("missing_windows", [])
+    _progress[incident.iid] = {"status": "QUEUED"}
+    video_link = incident.video_link
+    scheduler.submit(
+        (incident.inferred_domain or "auto").lower(),
+        lambda: crud.requeue_missing_windows(incident_iid, video_link, _progress),
+    )
+    return resp(Status.OK, {
+        "incident_iid": incident.iid,
+        "missing_windows": missing,
+        "stream_url": f"{settings.api_v1_prefix}/incidents/{incident.iid}/status/stream",
+    })
+
+
 @router.post(
     "/{incident_iid}/search",
     summary="Текстовый поиск по таймлайну",
@@ -125,7 +357,7 @@ async def upload_video(
 async def search_in_incident(
     incident_iid: int,
     prompt: str = Query(..., description="Текстовый запрос, например: 'столкновение' или 'падение груза'"),
-    session: AsyncSession = Depends(db.scoped_session_dependency),
+    session: AsyncSession = Depends(db.read_session_dependency),
 ):
     timelines = await crud.get_incident_timelines(session, incident_iid)
     words = prompt.lower().split()
@@ -148,35 +380,78 @@ async def search_in_incident(
     })
 
 
+@router.get(
+    "/{incident_iid}/risk-curve",
+    summary="Кривая риска",
+    description=(
+        "Прореженный `risk_score` таймлайна по времени: не больше `points` точек с сохранением пиков "
+        "(`method=lttb`) или минимумы/максимумы по корзинам (`method=minmax`). Один запрос вместо постраничного чтения `/timelines`."
+    ),
+)
+async def get_risk_curve(
+    incident_iid: int,
+    request: Request,
+    session: AsyncSession = Depends(db.read_session_dependency),
+    points: int = Query(default=500, ge=3, le=5000),
+    method: str = Query(default="lttb", pattern="^(lttb|minmax)$"),
+):
+    cache_key = f"risk-curve:{incident_iid}:{points}:{method}"
+    if (cached := response_cache.get(cache_key)) is not None:
+        return cached.to_response(request)
+
+    incident_status = await crud.get_incident_status(session, incident_iid)
+    if incident_status is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"incident {incident_iid} not found!")
+
+    import numpy as np
+    from app.api.v1.services.risk_curve import downsample
+    from app.api.v1.timelines.crud import get_risk_series
+
+    rows = await get_risk_series(session, incident_iid)
+    series = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    t, risk = downsample(series[:, 0], np.nan_to_num(series[:, 1]), points, method)
+    payload = resp(Status.OK, {
+        "incident_iid": incident_iid,
+        "status": incident_status,
+        "method": method,
+        "total_windows": len(series),
+        "t": t.round(2),
+        "risk": risk.round(3),
+    })
+    if incident_status == "DONE":
+        return response_cache.put(cache_key, incident_iid, dumps(payload)).to_response(request)
+    return json_response(dumps(payload))
+
+
 @router.get(
     "/{incident_iid}/report",
-    summary="Скачать DOCX-отчёт",
+    summary="Скачать отчёт",
     description=(
-        "Генерирует отчёт через LLM-сервис на основе сохранённого JSON анализа. "
+        "Отчёт по сохранённому JSON анализа (`format=docx|pdf`). "
         "Доступен только после завершения анализа (`status=DONE`). "
-        "Возвращает `.docx` файл."
+        "Готовый отчёт берётся из кэша на диске, поддерживается `If-None-Match`."
     ),
 )
 async def download_report(
-    incident=Depends(dependencies.incident_by_id),
+    request: Request,
+    incident=Depends(dependencies.read_incident_by_id),
+    format: str = Query(default="docx", pattern="^(docx|pdf)$", description="Формат отчёта"),
 ):
     if not incident.analysis_json:
         raise HTTPException(
             status_code=status.HTTP_425_TOO_EARLY,
             detail="Analysis not completed yet",
         )
-    from app.api.v1.services import llm_client
+    etag = f'"{reports.report_digest(incident.analysis_json)}-{format}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
 
-    video_path = Path(incident.video_link)
-    content = await llm_client.generate_report(
-        analysis_json=incident.analysis_json,
-        video_path=video_path if video_path.exists() else None,
-        return_format="docx",
-    )
-    return Response(
-        content=content,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        headers={"Content-Disposition": f"attachment; filename=report_{incident.iid}.docx"},
+    path = await reports.get_report(incident.iid, incident.analysis_json, incident.video_link, format)
+    return FileResponse(
+        str(path),
+        media_type=reports.REPORT_MEDIA_TYPES[format],
+        filename=f"report_{incident.iid}.{format}",
+        headers={"ETag": etag},
     )
 
 
@@ -186,7 +461,7 @@ async def download_report(
     description="Отдаёт исходный видеофайл. Поддерживает Range-запросы — браузер может перематывать по таймкодам.",
 )
 async def get_video(
-    incident=Depends(dependencies.incident_by_id),
+    incident=Depends(dependencies.read_incident_by_id),
 ):
     file_path = Path(incident.video_link)
     if not file_path.exists():
@@ -200,20 +475,38 @@ async def get_video(
     description="Возвращает все поля инцидента включая `analysis_json` с полным ответом LLM.",
 )
 async def get_incident(
-    incident=Depends(dependencies.incident_by_id),
+    incident_iid: int,
+    request: Request,
+    session: AsyncSession = Depends(db.read_session_dependency),
 ):
-    return resp(Status.OK, IncidentSchema.model_validate(incident).model_dump())
+    cache_key = f"incident:{incident_iid}"
+    if (cached := response_cache.get(cache_key)) is not None:
+        return cached.to_response(request)
+
+    incident = await dependencies.incident_by_id(incident_iid=incident_iid, session=session)
+    payload = resp(Status.OK, IncidentSchema.model_validate(incident).model_dump())
+    if incident.status == "DONE":
+        return response_cache.put(cache_key, incident_iid, dumps(payload)).to_response(request)
+    return payload
 
 
 @router.delete(
     "/{incident_iid}",
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Удалить инцидент",
-    description="Удаляет инцидент и каскадно все связанные события, таймлайн и логи.",
+    description="Удаляет инцидент и каскадно все связанные события, таймлайн и логи; видеофайл удаляется в фоне.",
 )
 async def delete_incident(
     incident=Depends(dependencies.incident_by_id),
     session: AsyncSession = Depends(db.scoped_session_dependency),
 ):
+    from app.api.v1.services import stream_ingest
+
+    # живой поток иначе продолжит писать окна удалённого инцидента
+    stream_ingest.stop_stream(incident.iid)
+    await apply_incident_rollup(session, incident, sign=-1)
     await session.delete(incident)
     await session.commit()
+    response_cache.invalidate_incident(incident.iid)
+    retention.discard(owned_path(incident.video_link), proxy_path(incident.iid))
+    await reports.delete_reports(incident.iid)
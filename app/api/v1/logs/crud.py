@@ -1,18 +1,21 @@
-from sqlalchemy import select
+from sqlalchemy import Row, Select, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .orm import Log
 
 
-async def get_logs(
+def _logs_stmt(stmt: Select, incident_iid: int | None, limit: int, offset: int) -> Select:
+    if incident_iid is not None:
+        stmt = stmt.where(Log.incident_iid == incident_iid)
+    return stmt.order_by(Log.timedate.desc()).limit(limit).offset(offset)
+
+
+async def get_log_rows(
     session: AsyncSession,
     incident_iid: int | None = None,
     limit: int = 50,
     offset: int = 0,
-) -> list[Log]:
-    stmt = select(Log)
-    if incident_iid is not None:
-        stmt = stmt.where(Log.incident_iid == incident_iid)
-    stmt = stmt.order_by(Log.timedate.desc()).limit(limit).offset(offset)
+) -> tuple[list[str], list[Row]]:
+    stmt = _logs_stmt(select(*Log.__table__.columns), incident_iid, limit, offset)
     result = await session.execute(stmt)
-    return list(result.scalars().all())
+    return list(result.keys()), list(result.all())
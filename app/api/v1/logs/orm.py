@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import ForeignKey, String, func
+from sqlalchemy import Float, ForeignKey, String, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.api.v1.base_model import Base
@@ -14,5 +14,6 @@ class Log(Base):
     event: Mapped[str] = mapped_column(String(50), default="UPD")
     model_version: Mapped[str] = mapped_column(String(50), default="")
     prompt_version: Mapped[str] = mapped_column(String(50), default="")
+    duration_sec: Mapped[float | None] = mapped_column(Float, nullable=True)
 
     incident: Mapped["Incident"] = relationship(back_populates="logs")
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 from pydantic import BaseModel, ConfigDict, Field
 
 
@@ -8,6 +9,7 @@ class LogBase(BaseModel):
     event: str = "UPD"
     model_version: str = ""
     prompt_version: str = ""
+    duration_sec: Optional[float] = None
 
 
 class LogCreate(LogBase):
@@ -2,9 +2,8 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import db
-from app.utils.structures import Status, resp
+from app.utils.structures import json_response, resp_rows
 from . import crud
-from .schemas import Log as LogSchema
 
 router = APIRouter(prefix="/logs", tags=["Logs"])
 
@@ -18,10 +17,10 @@ router = APIRouter(prefix="/logs", tags=["Logs"])
     ),
 )
 async def list_logs(
-    session: AsyncSession = Depends(db.scoped_session_dependency),
+    session: AsyncSession = Depends(db.read_session_dependency),
     incident_iid: int | None = Query(default=None, description="Фильтр по инциденту"),
     limit: int = Query(default=50, ge=1, le=200),
     offset: int = Query(default=0, ge=0),
 ):
-    logs = await crud.get_logs(session, incident_iid=incident_iid, limit=limit, offset=offset)
-    return resp(Status.OK, [LogSchema.model_validate(log).model_dump() for log in logs])
+    keys, rows = await crud.get_log_rows(session, incident_iid=incident_iid, limit=limit, offset=offset)
+    return json_response(resp_rows(keys, rows))
@@ -0,0 +1,165 @@
+"""
+Склейка отмеченных окон таймлайна в события (NumPy)
+
+risk_score окон → гистерезис (окно открывает событие от `high`, продолжает от `low`)
+→ заполнение пропусков короче `max_gap_sec` → NMS по пересечению интервалов → top-K по пику.
+"""
+import numpy as np
+
+from app.config import settings
+
+
+def hysteresis_segments(scores: np.ndarray, low: float, high: float) -> tuple[np.ndarray, np.ndarray]:
+    """Индексы первого и последнего окна участков `>= low`, в которых есть хотя бы одно окно `>= high`."""
+    active = np.concatenate(([False], scores >= low, [False]))
+    edges = np.flatnonzero(active[1:] != active[:-1])
+    first, last = edges[0::2], edges[1::2] - 1
+    strong = np.concatenate(([0], np.cumsum(scores >= high)))
+    keep = strong[last + 1] - strong[first] > 0
+    return first[keep], last[keep]
+
+
+def fill_gaps(
+    first: np.ndarray,
+    last: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    max_gap_sec: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    if len(first) < 2:
+        return first, last
+    gaps = starts[first[1:]] - ends[last[:-1]]
+    heads = np.flatnonzero(np.concatenate(([True], gaps > max_gap_sec)))
+    tails = np.concatenate((heads[1:] - 1, [len(first) - 1]))
+    return first[heads], last[tails]
+
+
+def segment_peaks(scores: np.ndarray, first: np.ndarray, last: np.ndarray) -> np.ndarray:
+    """Индекс окна с максимальным score внутри каждого участка; при равенстве — самого раннего."""
+    lengths = last - first + 1
+    offsets = np.cumsum(lengths)
+    segment_ids = np.repeat(np.arange(len(first)), lengths)
+    window_idx = np.arange(offsets[-1]) - np.repeat(offsets - lengths - first, lengths)
+    order = np.lexsort((-window_idx, scores[window_idx], segment_ids))
+    return window_idx[order[offsets - 1]]
+
+
+def nms_1d(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    scores: np.ndarray,
+    iou_threshold: float,
+    max_keep: int | None = None,
+) -> np.ndarray:
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size and (max_keep is None or len(keep) < max_keep):
+        i, rest = order[0], order[1:]
+        keep.append(i)
+        inter = np.clip(np.minimum(ends[i], ends[rest]) - np.maximum(starts[i], starts[rest]), 0, None)
+        union = (ends[i] - starts[i]) + (ends[rest] - starts[rest]) - inter
+        iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.intp)
+
+
+def consolidate_events(
+    timeline: list[dict],
+    event_type: str,
+    max_events: int | None = None,
+    low: float | None = None,
+    high: float | None = None,
+    max_gap_sec: float | None = None,
+    iou_threshold: float | None = None,
+) -> list[dict]:
+    """
+    События из окон таймлайна: одно событие на участок, confidence — пиковый score участка
+    """
+    low = settings.event_low_threshold if low is None else low
+    high = settings.event_high_threshold if high is None else high
+    max_gap_sec = settings.event_max_gap_sec if max_gap_sec is None else max_gap_sec
+    iou_threshold = settings.event_nms_iou if iou_threshold is None else iou_threshold
+    max_events = settings.llm_max_highlights if max_events is None else max_events
+
+    windows = sorted(timeline, key=lambda w: w["window_idx"])
+    if not windows:
+        return []
+    starts = np.fromiter((w["timestamp_sec"] for w in windows), dtype=np.float64, count=len(windows))
+    ends = np.fromiter(
+        (w.get("interval_end_sec") or w["timestamp_sec"] for w in windows), dtype=np.float64, count=len(windows),
+    )
+    risk = np.fromiter((w.get("risk_score") or 0.0 for w in windows), dtype=np.float64, count=len(windows))
+    flagged = np.fromiter((bool(w.get("has_event")) for w in windows), dtype=bool, count=len(windows))
+    # решение модели has_event открывает событие даже при заниженном risk_score
+    scores = np.clip(np.where(flagged, np.maximum(risk, high), risk), 0.0, 1.0)
+
+    first, last = hysteresis_segments(scores, low, high)
+    if not len(first):
+        return []
+    first, last = fill_gaps(first, last, starts, ends, max_gap_sec)
+    peaks = segment_peaks(scores, first, last)
+
+    seg_start, seg_end, peak_score = starts[first], ends[last], scores[peaks]
+    keep = nms_1d(seg_start, seg_end, peak_score, iou_threshold, max_keep=max_events or None)
+    keep = keep[np.argsort(seg_start[keep], kind="stable")]
+
+    events = []
+    for i in keep.tolist():
+        peak = windows[peaks[i]]
+        events.append({
+            "has_event": True,
+            "event_type": event_type,
+            "interval_start_sec": round(float(seg_start[i]), 2),
+            "interval_end_sec": round(float(seg_end[i]), 2),
+            "confidence": round(float(peak_score[i]), 3),
+            "description": peak.get("caption", ""),
+            "highlight_start_sec": round(float(starts[peaks[i]]), 2),
+            "highlight_end_sec": round(float(ends[peaks[i]]), 2),
+        })
+    return events
+
+
+def timeline_domains(timeline: list[dict]) -> list[str]:
+    """Домены, по которым окна таймлайна получили оценки в мультидоменном режиме."""
+    return sorted({d for w in timeline for d in (w.get("domain_scores") or {})})
+
+
+def domain_profile(timeline: list[dict], domains: list[str], top_k: int = 3) -> dict[str, float]:
+    """Оценка домена по всему видео — среднее `top_k` лучших окон: одиночный всплеск весит меньше устойчивого сигнала."""
+    if not timeline or not domains:
+        return {}
+    scores = np.array(
+        [[(w.get("domain_scores") or {}).get(d, 0.0) for d in domains] for w in timeline], dtype=np.float64,
+    )
+    k = min(top_k, len(timeline))
+    top = -np.sort(-scores, axis=0)[:k]
+    return {d: round(float(v), 4) for d, v in zip(domains, top.mean(axis=0))}
+
+
+def infer_domain(profile: dict[str, float], fallback: str = "other") -> str:
+    if not profile:
+        return fallback
+    domain, score = max(profile.items(), key=lambda item: item[1])
+    return domain if score >= settings.event_low_threshold else fallback
+
+
+def consolidate_multi_domain(timeline: list[dict], domains: list[str], max_events: int | None = None) -> list[dict]:
+    """
+    События по каждому домену из его собственной серии оценок; общий лимит —
+    сильнейшие `max_events` по confidence, в хронологическом порядке.
+    """
+    max_events = settings.llm_max_highlights if max_events is None else max_events
+    events = []
+    for domain in domains:
+        series = [
+            {
+                **w,
+                "risk_score": (w.get("domain_scores") or {}).get(domain, 0.0),
+                "has_event": bool(w.get("has_event")) and w.get("event_type") == domain,
+            }
+            for w in timeline
+        ]
+        events.extend(consolidate_events(series, domain, max_events=max_events))
+    if max_events:
+        events = sorted(events, key=lambda e: e["confidence"], reverse=True)[:max_events]
+    return sorted(events, key=lambda e: (e["interval_start_sec"], e["event_type"]))
@@ -0,0 +1,160 @@
+"""
+Потоковая выгрузка строк таблицы в NDJSON / CSV / Parquet с постоянным расходом памяти
+"""
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Sequence
+
+import orjson
+from sqlalchemy import Select
+
+from app.database import db
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _json_columns(types: Sequence[type]) -> list[int]:
+    # JSON-колонки (python_type — object) в CSV и Parquet пишутся строкой JSON
+    return [i for i, t in enumerate(types) if t is object]
+
+
+def _jsonify(rows: Sequence, columns: list[int]) -> Sequence:
+    if not columns:
+        return rows
+    out = []
+    for row in rows:
+        row = list(row)
+        for i in columns:
+            if row[i] is not None:
+                row[i] = orjson.dumps(row[i]).decode()
+        out.append(row)
+    return out
+
+
+class _NDJSONEncoder:
+    def __init__(self, keys: Sequence[str], types: Sequence[type]):
+        self.keys = keys
+
+    def encode(self, rows: Sequence) -> bytes:
+        return b"".join(orjson.dumps(dict(zip(self.keys, row))) + b"\n" for row in rows)
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _CSVEncoder:
+    def __init__(self, keys: Sequence[str], types: Sequence[type]):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.writer.writerow(keys)
+        self.json_columns = _json_columns(types)
+
+    def encode(self, rows: Sequence) -> bytes:
+        self.writer.writerows(_jsonify(rows, self.json_columns))
+        data = self.buffer.getvalue().encode()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def finish(self) -> bytes:
+        return self.encode([])
+
+
+class _ChunkSink:
+    """Файловый объект для ParquetWriter: отдаёт записанное кусками, но помнит абсолютную позицию."""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+class _ParquetEncoder:
+    def __init__(self, keys: Sequence[str], types: Sequence[type]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrow_types = {int: pa.int64(), float: pa.float64(), bool: pa.bool_(), str: pa.string(), datetime: pa.timestamp("us")}
+        self.pa = pa
+        self.schema = pa.schema([(key, arrow_types.get(t, pa.string())) for key, t in zip(keys, types)])
+        self.sink = _ChunkSink()
+        self.writer = pq.ParquetWriter(pa.PythonFile(self.sink, mode="w"), self.schema)
+        self.json_columns = _json_columns(types)
+
+    def encode(self, rows: Sequence) -> bytes:
+        columns = list(zip(*_jsonify(rows, self.json_columns)))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema,
+        ))
+        return self.sink.drain()
+
+    def finish(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+_ENCODERS = {"ndjson": _NDJSONEncoder, "csv": _CSVEncoder, "parquet": _ParquetEncoder}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def stream_export(stmt: Select, fmt: str, batch_size: int, gzip: bool = False) -> AsyncIterator[bytes]:
+    """
+    Строки `stmt` пачками по `batch_size` через серверный курсор.
+    Сессия открывается здесь, а не в зависимости: тело ответа стримится уже после выхода из обработчика.
+    """
+    encoder = _ENCODERS[fmt](
+        [c.name for c in stmt.selected_columns],
+        [c.type.python_type for c in stmt.selected_columns],
+    )
+    compressor = zlib.compressobj(wbits=31) if gzip else None
+
+    session = await db.open_read_session()
+    try:
+        result = await session.stream(stmt.execution_options(yield_per=batch_size))
+        async for rows in result.partitions(batch_size):
+            chunk = encoder.encode(rows)
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    finally:
+        await session.close()
+
+    chunk = encoder.finish()
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
@@ -2,13 +2,23 @@ import asyncio
 import base64
 import json
 from pathlib import Path
+from typing import Awaitable, Callable
 
 import cv2
 import httpx
+import numpy as np
 
 from app.config import settings
+from app.api.v1.services.consolidation import consolidate_events, consolidate_multi_domain, domain_profile, infer_domain
+from app.api.v1.services.limiter import llm_limiter
+from app.api.v1.services.prefilter import get_prefilter, summarize, threshold_for
+from app.api.v1.services.resilience import call_with_retry
+from app.utils.metrics import llm_request_timer, stage_timer
+from app.utils.singleflight import SingleFlight, digest
 
 
+_generate_flight = SingleFlight("/generate")
+
 DOMAIN_PROMPTS = {
     "traffic": "столкновение автомобилей, наезд, резкое торможение, ДТП, авария",
     "production": "падение груза, нарушение техники безопасности, обрушение, травма",
@@ -20,10 +30,25 @@ ANALYZE_PROMPT = """Ты анализируешь кадры из видеоза
 Ответь строго в JSON без markdown:
 {{"has_event": true/false, "description": "краткое описание", "risk_score": 0.0-1.0}}"""
 
-_CONCURRENCY = 5
+MULTI_DOMAIN_PROMPT = """Ты анализируешь кадры из видеозаписи (интервал {{start:.1f}}с – {{end:.1f}}с).
+Оцени от 0.0 до 1.0, насколько вероятно на кадрах опасное событие каждого типа:
+{domains}
+Ответь строго в JSON без markdown:
+{{{{"has_event": true/false, "description": "краткое описание", "scores": {{{{{scores}}}}}}}}}""".format(
+    domains="\n".join(f"- {domain}: {keywords}" for domain, keywords in DOMAIN_PROMPTS.items()),
+    scores=", ".join(f'"{domain}": 0.0-1.0' for domain in DOMAIN_PROMPTS),
+)
+
+# домен не задан — окно оценивается сразу по всем DOMAIN_PROMPTS одним запросом
+MULTI_DOMAIN_ALIASES = ("", "auto", "unknown")
+
 
+def _encode_frame_b64(frame) -> str:
+    _, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    return base64.b64encode(buf).decode()
 
-def _extract_frames_b64(video_path: Path, start: float, end: float, n: int = 4) -> list[str]:
+
+def _extract_frames(video_path: Path, start: float, end: float, n: int = 4) -> list[np.ndarray]:
     cap = cv2.VideoCapture(str(video_path))
     fps = cap.get(cv2.CAP_PROP_FPS) or 25
     frames = []
@@ -33,30 +58,67 @@ def _extract_frames_b64(video_path: Path, start: float, end: float, n: int = 4)
         ok, frame = cap.read()
         if not ok:
             continue
-        _, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-        frames.append(base64.b64encode(buf).decode())
+        frames.append(frame)
     cap.release()
     return frames
 
 
+def _extract_windows(
+    video_path: Path,
+    duration: float,
+    window_sec: float,
+    frames_per_window: int,
+    only_windows: set[int] | None,
+    prefilter,
+    gate: float | None,
+) -> tuple[list[tuple[int, float, float, list[str], float | None]], int]:
+    """
+    Нарезка окон (в отдельном потоке): кадры окна оцениваются префильтром и кодируются в JPEG,
+    только если окно уйдёт в VLM — окна ниже порога `gate` возвращаются без кадров.
+    """
+    windows = []
+    ts = 0.0
+    idx = 0
+    while ts < duration:
+        end = min(ts + window_sec, duration)
+        if only_windows is None or idx in only_windows:
+            frames = _extract_frames(video_path, ts, end, frames_per_window)
+            if frames:
+                score = prefilter.score(frames) if prefilter else None
+                skip = gate is not None and score < gate
+                windows.append((idx, ts, end, [] if skip else [_encode_frame_b64(f) for f in frames], score))
+        ts = end
+        idx += 1
+    return windows, idx
+
+
 async def _analyze_window(
     client: httpx.AsyncClient,
-    sem: asyncio.Semaphore,
     window_idx: int,
     ts: float,
     end: float,
     frames_b64: list[str],
     keywords: str,
     domain_clean: str,
+    multi_domain: bool = False,
+    fair_key: str | None = None,
 ) -> dict:
-    prompt = ANALYZE_PROMPT.format(start=ts, end=end, keywords=keywords)
-    async with sem:
-        response = await client.post(
-            f"{settings.llm_api_url}/generate",
-            json={"prompt": prompt, "images_b64": frames_b64, "max_tokens": 150},
-        )
-        response.raise_for_status()
-        text = response.json().get("text", "{}")
+    if multi_domain:
+        prompt = MULTI_DOMAIN_PROMPT.format(start=ts, end=end)
+    else:
+        prompt = ANALYZE_PROMPT.format(start=ts, end=end, keywords=keywords)
+
+    async def attempt() -> str:
+        async with llm_limiter.slot(observe_latency=True, key=fair_key):
+            with llm_request_timer("/generate"):
+                response = await client.post(
+                    f"{settings.llm_api_url}/generate",
+                    json={"prompt": prompt, "images_b64": frames_b64, "max_tokens": 150},
+                )
+                response.raise_for_status()
+            return response.json().get("text", "{}")
+
+    text = await _generate_flight.do(digest(prompt, *frames_b64), lambda: call_with_retry(attempt))
 
     try:
         parsed = json.loads(text.strip())
@@ -64,8 +126,14 @@ async def _analyze_window(
         parsed = {"has_event": False, "description": text[:200], "risk_score": 0.0}
 
     has_event = parsed.get("has_event", False)
-    risk_score = float(parsed.get("risk_score", 0.0))
     description = parsed.get("description", "")
+    domain_scores = None
+    if multi_domain:
+        raw = parsed.get("scores") if isinstance(parsed.get("scores"), dict) else {}
+        domain_scores = {d: min(1.0, max(0.0, float(raw.get(d) or 0.0))) for d in DOMAIN_PROMPTS}
+        risk_score = max(domain_scores.values())
+    else:
+        risk_score = float(parsed.get("risk_score", 0.0))
 
     return {
         "window_idx": window_idx,
@@ -75,6 +143,7 @@ async def _analyze_window(
         "risk_score": risk_score,
         "description": description,
         "domain_clean": domain_clean,
+        "domain_scores": domain_scores,
     }
 
 
@@ -83,71 +152,121 @@ async def analyze_video_by_frames(
     domain: str | None = None,
     window_sec: float = 2.0,
     frames_per_window: int = 4,
+    on_windows: Callable[[list[dict], int], Awaitable[None]] | None = None,
+    only_windows: set[int] | None = None,
 ) -> dict:
     domain_clean = (domain or "").strip("\"' ").lower()
     keywords = DOMAIN_PROMPTS.get(domain_clean, "опасное событие, инцидент, нарушение")
+    multi_domain = settings.llm_multi_domain and domain_clean in MULTI_DOMAIN_ALIASES
 
     cap = cv2.VideoCapture(str(video_path))
     duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / (cap.get(cv2.CAP_PROP_FPS) or 25)
     cap.release()
 
-    windows: list[tuple[int, float, float, list[str]]] = []
-    ts = 0.0
-    idx = 0
-    while ts < duration:
-        end = min(ts + window_sec, duration)
-        frames_b64 = _extract_frames_b64(video_path, ts, end, frames_per_window)
-        if frames_b64:
-            windows.append((idx, ts, end, frames_b64))
-        ts = end
-        idx += 1
+    prefilter = get_prefilter(settings.prefilter)
+    threshold = threshold_for(domain_clean)
+    gate = threshold if prefilter and settings.prefilter_mode == "gate" else None
+
+    with stage_timer("frame_extract"):
+        windows, idx = await asyncio.to_thread(
+            _extract_windows, video_path, duration, window_sec, frames_per_window, only_windows, prefilter, gate,
+        )
+    scores = {w_idx: score for w_idx, _, _, _, score in windows if score is not None}
 
-    sem = asyncio.Semaphore(_CONCURRENCY)
+    timeline = [
+        {
+            "window_idx": w_idx,
+            "timestamp_sec": round(w_ts, 2),
+            "interval_end_sec": round(w_end, 2),
+            "label": "SAFE",
+            "has_event": False,
+            "caption": "",
+            "risk_score": 0.0,
+            "event_type": "safe",
+            "prefilter_score": round(score, 4),
+            **({"domain_scores": dict.fromkeys(DOMAIN_PROMPTS, 0.0)} if multi_domain else {}),
+        }
+        for w_idx, w_ts, w_end, w_frames, score in windows
+        if not w_frames
+    ]
+    missing_windows = []
+    batch: list[dict] = list(timeline)
     async with httpx.AsyncClient(timeout=httpx.Timeout(connect=10.0, read=120.0, write=30.0, pool=10.0)) as client:
-        tasks = [
-            _analyze_window(client, sem, w_idx, w_ts, w_end, w_frames, keywords, domain_clean)
-            for w_idx, w_ts, w_end, w_frames in windows
-        ]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-    timeline = []
-    events = []
-    for r in results:
-        if isinstance(r, Exception):
-            continue
-        has_event = r["has_event"]
-        timeline.append({
-            "window_idx": r["window_idx"],
-            "timestamp_sec": round(r["ts"], 2),
-            "interval_end_sec": round(r["end"], 2),
-            "label": "EVENT" if has_event else "SAFE",
-            "has_event": has_event,
-            "caption": r["description"],
-            "risk_score": r["risk_score"],
-            "event_type": domain_clean if has_event else "safe",
-        })
-        if has_event:
-            events.append({
-                "has_event": True,
-                "event_type": domain_clean or "event",
-                "interval_start_sec": round(r["ts"], 2),
+        tasks = {
+            asyncio.ensure_future(
+                _analyze_window(
+                    client, w_idx, w_ts, w_end, w_frames, keywords, domain_clean, multi_domain, fair_key=str(video_path),
+                )
+            ): (w_idx, w_ts, w_end)
+            for w_idx, w_ts, w_end, w_frames, _ in windows
+            if w_frames
+        }
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                r = await next_done
+            except Exception:
+                continue
+            has_event = r["has_event"]
+            event_type = domain_clean
+            if r["domain_scores"]:
+                event_type = max(r["domain_scores"].items(), key=lambda item: item[1])[0]
+            window = {
+                "window_idx": r["window_idx"],
+                "timestamp_sec": round(r["ts"], 2),
                 "interval_end_sec": round(r["end"], 2),
-                "description": r["description"],
-                "highlight_start_sec": round(r["ts"], 2),
-                "highlight_end_sec": round(r["end"], 2),
+                "label": "EVENT" if has_event else "SAFE",
+                "has_event": has_event,
+                "caption": r["description"],
+                "risk_score": r["risk_score"],
+                "event_type": event_type if has_event else "safe",
+            }
+            if r["domain_scores"]:
+                window["domain_scores"] = r["domain_scores"]
+            if r["window_idx"] in scores:
+                window["prefilter_score"] = round(scores[r["window_idx"]], 4)
+            timeline.append(window)
+            if on_windows is not None:
+                batch.append(window)
+                if len(batch) >= settings.timeline_commit_batch:
+                    await on_windows(batch, len(windows))
+                    batch = []
+        if batch and on_windows is not None:
+            await on_windows(batch, len(windows))
+
+    for task, (w_idx, w_ts, w_end) in tasks.items():
+        if task.exception() is not None:
+            missing_windows.append({
+                "window_idx": w_idx,
+                "start_sec": round(w_ts, 2),
+                "end_sec": round(w_end, 2),
+                "error": repr(task.exception())[:200],
             })
+    missing_windows.sort(key=lambda x: x["window_idx"])
 
     timeline.sort(key=lambda x: x["window_idx"])
+    metadata = {
+        "duration_sec": round(duration, 2),
+        "num_frames": int(duration * 25),
+        "num_windows": idx,
+    }
+    if multi_domain:
+        profile = domain_profile(timeline, list(DOMAIN_PROMPTS))
+        inferred_domain = infer_domain(profile)
+        events = consolidate_multi_domain(timeline, list(DOMAIN_PROMPTS))
+        metadata.update({"multi_domain": True, "domain_scores": profile})
+    else:
+        inferred_domain = domain_clean or "other"
+        events = consolidate_events(timeline, domain_clean or "event")
+    if prefilter:
+        metadata["prefilter"] = summarize(prefilter.name, settings.prefilter_mode, threshold, scores, timeline)
 
     return {
-        "status": "completed",
-        "inferred_domain": domain_clean or "other",
+        "status": "partial" if missing_windows else "completed",
+        "timeline_persisted": on_windows is not None,
+        "inferred_domain": inferred_domain,
         "has_event": len(events) > 0,
         "events": events,
         "timeline": timeline,
-        "metadata": {
-            "duration_sec": round(duration, 2),
-            "num_frames": int(duration * 25),
-            "num_windows": idx,
-        },
+        "missing_windows": missing_windows,
+        "metadata": metadata,
     }
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Hashable
+
+from app.config import settings
+from app.api.v1.services.resilience import is_retryable
+from app.utils.metrics import Gauge
+
+_BASELINE_WINDOW_SEC = 60.0
+
+
+class AdaptiveLimiter:
+    """
+    Общий на процесс лимит параллельных запросов к LLM-сервису (AIMD).
+
+    Лимит растёт на 1 за «окно» успешных запросов, пока сервис отвечает не медленнее
+    `latency_tolerance` × минимальной задержки `/generate` за последнюю минуту, и умножается
+    на `backoff_ratio` при таймаутах/5xx или росте задержки — не чаще раза за время ответа.
+    Ожидающие запросы обслуживаются по кругу между ключами (видео, поток), внутри ключа — по очереди:
+    длинное видео, поставившее в очередь все свои окна, не задерживает окна следующих инцидентов.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        latency_tolerance: float,
+        backoff_ratio: float,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+
+        self.inflight = 0
+        self.requests = 0
+        self.errors = 0
+        self.latency_ewma = 0.0
+        self.latency_min = 0.0
+        self._window_min = 0.0
+        self._window_started = 0.0
+        self._last_decrease = 0.0
+        self._waiters: dict[Hashable, deque[asyncio.Future]] = {}
+        self._order: deque[Hashable] = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._waiters.values())
+
+    async def acquire(self, key: Hashable = None) -> None:
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._waiters.get(key)
+        if queue is None:
+            queue = self._waiters[key] = deque()
+            self._order.append(key)
+        queue.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(key, waiter)
+            raise
+
+    def _discard(self, key: Hashable, waiter: asyncio.Future) -> None:
+        queue = self._waiters.get(key)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self._waiters[key]
+            self._order.remove(key)
+
+    def release(self) -> None:
+        self.inflight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._order and self.inflight < int(self.limit):
+            key = self._order.popleft()
+            queue = self._waiters[key]
+            waiter = queue.popleft()
+            if queue:
+                self._order.append(key)
+            else:
+                del self._waiters[key]
+            if waiter.done():
+                continue
+            self.inflight += 1
+            waiter.set_result(None)
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.latency_ewma:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * self.backoff_ratio)
+
+    def on_success(self, latency: float | None) -> None:
+        self.requests += 1
+        if latency is None:
+            return
+        now = time.monotonic()
+        if self.latency_ewma == 0.0:
+            self.latency_ewma = self.latency_min = self._window_min = latency
+            self._window_started = now
+        else:
+            self.latency_ewma += 0.2 * (latency - self.latency_ewma)
+            self._window_min = min(self._window_min, latency)
+            self.latency_min = min(self.latency_min, latency)
+        if now - self._window_started > _BASELINE_WINDOW_SEC:
+            self.latency_min = self._window_min
+            self._window_min = latency
+            self._window_started = now
+
+        if self.latency_ewma > self.latency_min * self.latency_tolerance:
+            self._decrease()
+        elif self.inflight >= int(self.limit) - 1:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._wake()
+
+    def on_error(self) -> None:
+        self.requests += 1
+        self.errors += 1
+        self._decrease()
+
+    @asynccontextmanager
+    async def slot(self, observe_latency: bool = False, key: Hashable = None):
+        await self.acquire(key)
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as exc:
+            if is_retryable(exc):
+                self.on_error()
+            raise
+        else:
+            self.on_success(time.monotonic() - started if observe_latency else None)
+        finally:
+            self.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "inflight": self.inflight,
+            "queue_depth": self.queue_depth,
+            "latency_ewma_sec": round(self.latency_ewma, 3),
+            "latency_min_sec": round(self.latency_min, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+llm_limiter = AdaptiveLimiter(
+    initial_limit=settings.llm_initial_concurrency,
+    min_limit=settings.llm_min_concurrency,
+    max_limit=settings.llm_max_concurrency,
+    latency_tolerance=settings.llm_latency_tolerance,
+    backoff_ratio=settings.llm_backoff_ratio,
+)
+
+Gauge("sigma_llm_concurrency_limit", "Текущий адаптивный лимит запросов к LLM", fn=lambda: llm_limiter.limit)
+Gauge("sigma_llm_inflight", "Запросы к LLM в работе", fn=lambda: llm_limiter.inflight)
+Gauge("sigma_llm_queue_depth", "Запросы к LLM в очереди на слот", fn=lambda: llm_limiter.queue_depth)
@@ -1,19 +1,43 @@
+import asyncio
+import copy
 import httpx
+from contextlib import ExitStack
 from pathlib import Path
 
 from app.config import settings
+from app.api.v1.services.limiter import llm_limiter
+from app.api.v1.services.resilience import call_with_retry, is_retryable
+from app.utils.metrics import llm_request_timer, stage_timer
+from app.utils.singleflight import SingleFlight, digest, file_digest
 
+_analyze_flight = SingleFlight("/analyze_video")
+_report_flight = SingleFlight("/generate_report_from_json")
 
-async def _call_analyze(file_path: Path, params: dict) -> dict:
-    async with httpx.AsyncClient(timeout=httpx.Timeout(connect=10.0, read=600.0, write=60.0, pool=5.0)) as client:
-        with open(file_path, "rb") as f:
-            response = await client.post(
-                f"{settings.llm_api_url}/analyze_video",
-                params=params,
-                files={"file": (file_path.name, f, "video/mp4")},
-            )
-        response.raise_for_status()
-        return response.json()
+
+async def _call_analyze(file_path: Path, params: dict, file_hash: str) -> dict:
+    async def attempt() -> dict:
+        async with llm_limiter.slot(), httpx.AsyncClient(timeout=httpx.Timeout(connect=10.0, read=600.0, write=60.0, pool=5.0)) as client:
+            with llm_request_timer("/analyze_video"), open(file_path, "rb") as f:
+                response = await client.post(
+                    f"{settings.llm_api_url}/analyze_video",
+                    params=params,
+                    files={"file": (file_path.name, f, "video/mp4")},
+                )
+                response.raise_for_status()
+            return response.json()
+
+    key = (file_hash, tuple(sorted(params.items())))
+    # у каждого вызывающего своя копия: результат дальше мутируется при сохранении
+    return copy.deepcopy(await _analyze_flight.do(key, lambda: call_with_retry(attempt)))
+
+
+async def _try_call_analyze(file_path: Path, params: dict, file_hash: str) -> dict | None:
+    try:
+        return await _call_analyze(file_path, params, file_hash)
+    except Exception as exc:
+        if not is_retryable(exc):
+            raise
+        return None
 
 
 async def analyze_video(
@@ -21,7 +45,13 @@ async def analyze_video(
     domain: str | None = None,
     _progress: dict | None = None,
     _iid: int | None = None,
+    _on_windows=None,
+    source_path: Path | None = None,
 ) -> dict:
+    """
+    `file_path` — то, что отправляется в LLM (прокси), `source_path` — исходная загрузка:
+    по её содержимому одинаковые видео склеиваются в один запрос, даже если прокси перекодированы по-разному.
+    """
     def _report(extra: dict) -> None:
         if _progress is not None and _iid is not None:
             _progress[_iid] = {"status": "PROCESSING", **extra}
@@ -37,25 +67,31 @@ async def analyze_video(
     if domain_clean and domain_clean not in ("auto", "unknown"):
         params["domain"] = domain_clean
 
+    file_hash = await asyncio.to_thread(file_digest, source_path or file_path)
+
     _report({"stage": 1, "stage_name": "Первичный анализ"})
-    result = await _call_analyze(file_path, params)
-
-    if not result.get("has_event") and not result.get("events"):
-        retry_params = {
-            **params,
-            "window_sec": max(0.5, settings.llm_window_sec / 2),
-            "target_fps": min(30, settings.llm_target_fps * 2),
-            "frames_per_window": min(10, settings.llm_frames_per_window + 2),
-        }
-        _report({"stage": 2, "stage_name": "Повторный анализ (мелкие окна)"})
-        retry_result = await _call_analyze(file_path, retry_params)
-        if retry_result.get("has_event") or retry_result.get("events"):
-            return retry_result
+    with stage_timer("stage_1"):
+        result = await _try_call_analyze(file_path, params, file_hash)
+
+    if result is None or (not result.get("has_event") and not result.get("events")):
+        if result is not None:
+            retry_params = {
+                **params,
+                "window_sec": max(0.5, settings.llm_window_sec / 2),
+                "target_fps": min(30, settings.llm_target_fps * 2),
+                "frames_per_window": min(10, settings.llm_frames_per_window + 2),
+            }
+            _report({"stage": 2, "stage_name": "Повторный анализ (мелкие окна)"})
+            with stage_timer("stage_2"):
+                retry_result = await _try_call_analyze(file_path, retry_params, file_hash)
+            if retry_result and (retry_result.get("has_event") or retry_result.get("events")):
+                return retry_result
 
         from app.api.v1.services.frame_analyzer import analyze_video_by_frames
         _report({"stage": 3, "stage_name": "Покадровый анализ"})
-        frame_result = await analyze_video_by_frames(file_path, domain=domain)
-        if frame_result.get("has_event") or frame_result.get("events"):
+        with stage_timer("stage_3"):
+            frame_result = await analyze_video_by_frames(file_path, domain=domain, on_windows=_on_windows)
+        if result is None or frame_result.get("has_event") or frame_result.get("events"):
             return frame_result
 
     return result
@@ -66,15 +102,21 @@ async def generate_report(
     video_path: Path | None = None,
     return_format: str = "docx",
 ) -> bytes:
-    files: dict = {"analysis_json": (None, analysis_json)}
-    if video_path and video_path.exists():
-        files["video"] = (video_path.name, open(video_path, "rb"), "video/mp4")
-
-    async with httpx.AsyncClient(timeout=httpx.Timeout(connect=10.0, read=300.0, write=60.0, pool=5.0)) as client:
-        response = await client.post(
-            f"{settings.llm_api_url}/generate_report_from_json",
-            params={"return_format": return_format},
-            files=files,
-        )
-        response.raise_for_status()
-        return response.content
+    async def attempt() -> bytes:
+        with ExitStack() as stack:
+            files: dict = {"analysis_json": (None, analysis_json)}
+            if video_path and video_path.exists():
+                files["video"] = (video_path.name, stack.enter_context(open(video_path, "rb")), "video/mp4")
+
+            async with llm_limiter.slot(), httpx.AsyncClient(timeout=httpx.Timeout(connect=10.0, read=300.0, write=60.0, pool=5.0)) as client:
+                with llm_request_timer("/generate_report_from_json"):
+                    response = await client.post(
+                        f"{settings.llm_api_url}/generate_report_from_json",
+                        params={"return_format": return_format},
+                        files=files,
+                    )
+                    response.raise_for_status()
+                return response.content
+
+    key = (digest(analysis_json), str(video_path) if video_path else "", return_format)
+    return await _report_flight.do(key, lambda: call_with_retry(attempt))
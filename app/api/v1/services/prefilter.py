@@ -0,0 +1,134 @@
+"""
+Локальный CPU-префильтр окон покадрового анализа.
+
+Каждое окно получает дешёвую оценку «что-то происходит» в диапазоне 0..1; окна ниже порога домена
+записываются в таймлайн как SAFE без запроса к VLM. В режиме `shadow` в VLM уходят все окна,
+а по результату считается полнота (recall) префильтра.
+"""
+import threading
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from app.config import settings
+from app.utils.metrics import Counter
+
+prefilter_windows_total = Counter(
+    "sigma_prefilter_windows_total",
+    "Окна покадрового анализа по решению префильтра",
+    labels=("prefilter", "mode", "decision"),
+)
+prefilter_missed_total = Counter(
+    "sigma_prefilter_missed_total",
+    "Окна с событием по VLM, которые префильтр бы пропустил (режим shadow)",
+    labels=("prefilter",),
+)
+
+_SCORE_WIDTH = 160
+
+
+def _gray(frame: np.ndarray) -> np.ndarray:
+    height, width = frame.shape[:2]
+    small = cv2.resize(frame, (_SCORE_WIDTH, max(1, height * _SCORE_WIDTH // width)), interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+
+class MotionPrefilter:
+    """Энергия движения: наибольшая средняя разность соседних кадров окна."""
+
+    name = "motion"
+
+    def score(self, frames: list[np.ndarray]) -> float:
+        grays = [_gray(f) for f in frames]
+        if len(grays) < 2:
+            return 1.0
+        return max(float(cv2.absdiff(a, b).mean()) for a, b in zip(grays, grays[1:])) / 255.0
+
+
+class FlowPrefilter:
+    """Оптический поток Фарнебэка: наибольшее среднее смещение в долях ширины кадра."""
+
+    name = "flow"
+
+    def score(self, frames: list[np.ndarray]) -> float:
+        grays = [_gray(f) for f in frames]
+        if len(grays) < 2:
+            return 1.0
+        magnitudes = []
+        for a, b in zip(grays, grays[1:]):
+            flow = cv2.calcOpticalFlowFarneback(a, b, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+            magnitudes.append(float(np.linalg.norm(flow, axis=2).mean()))
+        return max(magnitudes) / _SCORE_WIDTH
+
+
+class DNNPrefilter:
+    """
+    Произвольная модель OpenCV DNN (`PREFILTER_DNN_MODEL`, ONNX/Caffe/TF):
+    оценка окна — максимум выхода сети по кадрам, ожидается вероятность 0..1.
+    """
+
+    name = "dnn"
+
+    def __init__(self):
+        if not settings.prefilter_dnn_model:
+            raise RuntimeError("PREFILTER=dnn requires PREFILTER_DNN_MODEL")
+        self.net = cv2.dnn.readNet(settings.prefilter_dnn_model)
+        self.lock = threading.Lock()
+
+    def score(self, frames: list[np.ndarray]) -> float:
+        if not frames:
+            return 1.0
+        size = settings.prefilter_dnn_input_size
+        blob = cv2.dnn.blobFromImages(frames, 1 / 255.0, (size, size), swapRB=True)
+        with self.lock:
+            self.net.setInput(blob)
+            out = self.net.forward()
+        return float(np.max(out))
+
+
+PREFILTERS = {"motion": MotionPrefilter, "flow": FlowPrefilter, "dnn": DNNPrefilter}
+
+
+@lru_cache
+def get_prefilter(name: str):
+    if not name:
+        return None
+    if name not in PREFILTERS:
+        raise ValueError(f"unknown prefilter {name!r}, expected one of {sorted(PREFILTERS)}")
+    return PREFILTERS[name]()
+
+
+def threshold_for(domain: str) -> float:
+    return settings.prefilter_thresholds.get(domain, settings.prefilter_default_threshold)
+
+
+def is_positive(window: dict) -> bool:
+    return bool(window["has_event"]) or window["risk_score"] >= settings.event_high_threshold
+
+
+def summarize(name: str, mode: str, threshold: float, scores: dict[int, float], timeline: list[dict]) -> dict:
+    """
+    Итог префильтра для `metadata` по оценкам окон `scores`. В режиме `shadow` окна
+    с событием по VLM, чья оценка ниже порога, считаются пропущенными префильтром.
+    """
+    skipped = sum(score < threshold for score in scores.values())
+    prefilter_windows_total.inc(skipped, prefilter=name, mode=mode, decision="skipped")
+    prefilter_windows_total.inc(len(scores) - skipped, prefilter=name, mode=mode, decision="forwarded")
+    summary = {
+        "name": name,
+        "mode": mode,
+        "threshold": threshold,
+        "forwarded": len(scores) - skipped,
+        "skipped": skipped,
+    }
+    if mode == "shadow":
+        positives = [w["window_idx"] for w in timeline if w["window_idx"] in scores and is_positive(w)]
+        missed = sum(scores[idx] < threshold for idx in positives)
+        prefilter_missed_total.inc(missed, prefilter=name)
+        summary.update({
+            "positives": len(positives),
+            "missed": missed,
+            "recall": round(1 - missed / len(positives), 4) if positives else None,
+        })
+    return summary
@@ -0,0 +1,139 @@
+"""
+Прокси для анализа: одна перекодировка загруженного видео в низкое разрешение с коротким GOP,
+`media/videos/{incident}.proxy.mp4` рядом с оригиналом. Все стадии анализа читают и отправляют прокси,
+оригинал остаётся для просмотра и нарезки.
+"""
+import asyncio
+import logging
+import os
+import shutil
+from pathlib import Path
+
+from app.config import settings
+from app.utils.metrics import stage_timer
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_proxy_flight = SingleFlight("analysis_proxy")
+
+
+def proxy_path(incident_iid: int) -> Path:
+    return settings.media_dir / "videos" / f"{incident_iid}.proxy.mp4"
+
+
+def proxy_fps() -> int:
+    # стадия 2 сэмплирует вдвое чаще, прокси должен это выдержать
+    return min(30, settings.llm_target_fps * 2)
+
+
+def _is_fresh(proxy: Path, original: Path) -> bool:
+    return proxy.exists() and proxy.stat().st_mtime >= original.stat().st_mtime
+
+
+def _probe(original: Path) -> tuple[float, int, int]:
+    import cv2
+
+    cap = cv2.VideoCapture(str(original))
+    try:
+        return cap.get(cv2.CAP_PROP_FPS) or 25.0, int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+
+
+def _output_size(width: int, height: int) -> tuple[int, int]:
+    scale = min(1.0, settings.analysis_proxy_max_height / height) if height else 1.0
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+async def _transcode_ffmpeg(ffmpeg: str, original: Path, tmp: Path, fps: float, size: tuple[int, int]) -> None:
+    gop = max(1, round(fps))
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg, "-y", "-loglevel", "error", "-i", str(original),
+        "-vf", f"fps={fps},scale={size[0]}:{size[1]}",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", str(settings.analysis_proxy_crf),
+        "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+        "-an", "-movflags", "+faststart", "-f", "mp4", str(tmp),
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {process.returncode}: {stderr.decode(errors='replace')[-500:]}")
+
+
+def _transcode_cv2(original: Path, tmp: Path, source_fps: float, fps: float, size: tuple[int, int]) -> None:
+    import cv2
+
+    cap = cv2.VideoCapture(str(original))
+    writer = cv2.VideoWriter(str(tmp), cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    if not writer.isOpened():
+        cap.release()
+        raise RuntimeError("cv2.VideoWriter could not open mp4v output")
+    step = source_fps / fps
+    next_frame = 0.0
+    idx = 0
+    try:
+        while cap.grab():
+            if idx >= next_frame:
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                if (frame.shape[1], frame.shape[0]) != size:
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+                writer.write(frame)
+                next_frame += step
+            idx += 1
+    finally:
+        cap.release()
+        writer.release()
+
+
+async def _build(original: Path, proxy: Path) -> Path:
+    source_fps, width, height = await asyncio.to_thread(_probe, original)
+    if not width or not height:
+        raise RuntimeError(f"cannot read video {original}")
+    fps = min(float(proxy_fps()), source_fps)
+    size = _output_size(width, height)
+    if size == (width, height) and fps == source_fps:
+        return original
+
+    tmp = proxy.with_name(proxy.stem + ".tmp.mp4")
+    try:
+        with stage_timer("analysis_proxy"):
+            if ffmpeg := shutil.which("ffmpeg"):
+                await _transcode_ffmpeg(ffmpeg, original, tmp, fps, size)
+            else:
+                await asyncio.to_thread(_transcode_cv2, original, tmp, source_fps, fps, size)
+        os.replace(tmp, proxy)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return proxy
+
+
+async def ensure_proxy(incident_iid: int, original: Path) -> Path:
+    """
+    Путь к видео для анализа: готовый или только что собранный прокси. Оригинал — если он
+    уже не больше прокси, при ошибке перекодировки или с `ANALYSIS_PROXY=false`.
+    """
+    if not settings.analysis_proxy:
+        return original
+    proxy = proxy_path(incident_iid)
+    if await asyncio.to_thread(_is_fresh, proxy, original):
+        return proxy
+    try:
+        return await _proxy_flight.do(str(proxy), lambda: _build(original, proxy))
+    except Exception as exc:
+        logger.warning("analysis proxy for incident %s failed, using original: %r", incident_iid, exc)
+        return original
+
+
+def _existing_proxy(incident_iid: int, original: Path | None) -> Path | None:
+    proxy = proxy_path(incident_iid)
+    if original is None or not original.exists():
+        return proxy if proxy.exists() else None
+    return proxy if settings.analysis_proxy and _is_fresh(proxy, original) else original
+
+
+async def existing_proxy(incident_iid: int, original: Path | None) -> Path | None:
+    """Прокси, если он уже собран и не старше оригинала, иначе оригинал; `None`, если нет ни того, ни другого."""
+    return await asyncio.to_thread(_existing_proxy, incident_iid, original)
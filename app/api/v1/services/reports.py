@@ -0,0 +1,123 @@
+"""
+Кэш сгенерированных отчётов на диске: `media/reports/{incident}/{hash(analysis_json)}.{format}`
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+from pathlib import Path
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import db
+from app.api.v1.incidents.orm import Incident
+from app.api.v1.services.proxy import existing_proxy
+
+logger = logging.getLogger(__name__)
+
+REPORT_MEDIA_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+
+_inflight: dict[Path, asyncio.Task] = {}
+
+
+def report_digest(analysis_json: str) -> str:
+    return hashlib.sha256(analysis_json.encode()).hexdigest()[:32]
+
+
+def report_path(incident_iid: int, analysis_json: str, return_format: str) -> Path:
+    return settings.media_dir / "reports" / str(incident_iid) / f"{report_digest(analysis_json)}.{return_format}"
+
+
+def _write_report(path: Path, content: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+
+def _drop_stale(path: Path, current: str) -> None:
+    # только что записанный файл остаётся: его может ждать запрос, даже если analysis_json уже сменился
+    for stale in path.parent.glob(f"*{path.suffix}"):
+        if stale != path and stale.stem != current:
+            stale.unlink(missing_ok=True)
+
+
+async def _current_digest(incident_iid: int) -> str | None:
+    async with db.session_factory() as session:
+        analysis_json = (
+            await session.execute(select(Incident.analysis_json).where(Incident.iid == incident_iid))
+        ).scalar_one_or_none()
+    return report_digest(analysis_json) if analysis_json else None
+
+
+async def _render(path: Path, incident_iid: int, analysis_json: str, video_link: str | None, return_format: str) -> Path:
+    from app.api.v1.services import llm_client
+
+    video_path = await existing_proxy(incident_iid, Path(video_link) if video_link else None)
+    content = await llm_client.generate_report(
+        analysis_json=analysis_json,
+        video_path=video_path,
+        return_format=return_format,
+    )
+    # запись и проверка не прерываются отменой: иначе файл может появиться уже после delete_reports
+    await asyncio.shield(_store(path, incident_iid, content))
+    return path
+
+
+async def _store(path: Path, incident_iid: int, content: bytes) -> None:
+    await asyncio.to_thread(_write_report, path, content)
+    current = await _current_digest(incident_iid)
+    if current is None:
+        # инцидент удалили, пока шла генерация
+        await asyncio.to_thread(shutil.rmtree, path.parent, ignore_errors=True)
+    else:
+        # рендер по старому analysis_json может закончиться позже нового — чистим по текущему digest
+        await asyncio.to_thread(_drop_stale, path, current)
+
+
+def _on_done(path: Path, task: asyncio.Task) -> None:
+    _inflight.pop(path, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("report %s failed: %r", path, task.exception())
+
+
+def _start(incident_iid: int, analysis_json: str, video_link: str | None, return_format: str) -> tuple[Path, asyncio.Task | None]:
+    path = report_path(incident_iid, analysis_json, return_format)
+    if path.exists():
+        return path, None
+    task = _inflight.get(path)
+    if task is None:
+        task = asyncio.create_task(_render(path, incident_iid, analysis_json, video_link, return_format))
+        task.add_done_callback(lambda t: _on_done(path, t))
+        _inflight[path] = task
+    return path, task
+
+
+async def get_report(incident_iid: int, analysis_json: str, video_link: str | None, return_format: str) -> Path:
+    """
+    Готовый файл отчёта; одновременные запросы одного отчёта ждут одну генерацию
+    """
+    path, task = _start(incident_iid, analysis_json, video_link, return_format)
+    if task is None:
+        return path
+    # отключение клиента не отменяет генерацию, которую ждут другие запросы и кэш
+    return await asyncio.shield(task)
+
+
+def prerender_reports(incident_iid: int, analysis_json: str, video_link: str | None) -> None:
+    for return_format in settings.report_prerender_formats:
+        _start(incident_iid, analysis_json, video_link, return_format)
+
+
+async def delete_reports(incident_iid: int) -> None:
+    """Вызывается после удаления инцидента из БД: генерации, которые уже идут, отменяются."""
+    directory = settings.media_dir / "reports" / str(incident_iid)
+    for path, task in list(_inflight.items()):
+        if path.parent == directory:
+            task.cancel()
+    await asyncio.to_thread(shutil.rmtree, directory, ignore_errors=True)
@@ -0,0 +1,103 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from app.config import settings
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    import httpx
+
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, httpx.TransportError)
+
+
+class CircuitBreaker:
+    """
+    closed → open после `failure_threshold` подряд неудачных вызовов;
+    через `reset_timeout` пропускает один пробный запрос (half-open).
+    Пока цепь разомкнута, новые запросы не отправляются, а ждут в `wait_ready`.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    async def wait_ready(self) -> None:
+        while True:
+            if self.state == "closed":
+                return
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return
+            await asyncio.sleep(max(remaining, 0.1))
+
+    def release(self) -> None:
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+
+llm_breaker = CircuitBreaker(
+    failure_threshold=settings.llm_breaker_failures,
+    reset_timeout=settings.llm_breaker_reset_sec,
+)
+
+
+async def call_with_retry(
+    fn: Callable[[], Awaitable[T]],
+    attempts: int | None = None,
+    breaker: CircuitBreaker = llm_breaker,
+) -> T:
+    """
+    Повторяет `fn` при сетевых ошибках, таймаутах и 5xx/429 с экспоненциальной
+    задержкой и full jitter. Ошибки 4xx пробрасываются сразу и не размыкают цепь.
+    """
+    attempts = attempts or settings.llm_retry_attempts
+    for attempt in range(attempts):
+        await breaker.wait_ready()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as exc:
+            import httpx
+
+            if isinstance(exc, httpx.HTTPStatusError) and not is_retryable(exc):
+                breaker.record_success()
+                raise
+            if not is_retryable(exc):
+                breaker.release()
+                raise
+            breaker.record_failure()
+            if attempt == attempts - 1:
+                raise
+            delay = min(settings.llm_retry_max_sec, settings.llm_retry_base_sec * 2 ** attempt)
+            await asyncio.sleep(random.uniform(0, delay))
+        else:
+            breaker.record_success()
+            return result
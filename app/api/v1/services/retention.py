@@ -0,0 +1,345 @@
+"""
+Хранение видео: политики по возрасту / статусу / `has_event`, холодный уровень и фоновая очистка.
+
+Политика из `RETENTION_POLICIES` — словарь вида
+`{"older_than_days": 30, "status": "DONE", "has_event": false, "action": "delete"}`:
+`cold` переносит файл в `MEDIA_COLD_DIR`, `compress` перекодирует его туда через ffmpeg
+(без ffmpeg — просто переносит), `delete` удаляет. Приложение трогает только свои файлы —
+в `media/videos` и холодном каталоге; видео из `INGEST_DIR` и адреса потоков не затрагиваются,
+удаляются только их прокси для анализа.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import not_, or_, select
+
+from app.config import settings
+from app.database import db
+from app.utils.cache import response_cache
+from app.utils.metrics import Counter, Gauge
+from app.api.v1.incidents.orm import Incident
+from app.api.v1.services.proxy import proxy_path
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ("cold", "compress", "delete")
+ACTIVE_STATUSES = ("PENDING", "UPLOADING", "SAVED", "PROCESSING")
+OWNER_MARKER = ".sigma-owner"
+
+media_bytes = Gauge("sigma_media_bytes", "Объём видео по уровню хранения", labels=("tier",))
+media_files = Gauge("sigma_media_files", "Число видеофайлов по уровню хранения", labels=("tier",))
+retention_actions_total = Counter(
+    "sigma_retention_actions_total",
+    "Действия очистки медиа",
+    labels=("action",),
+)
+
+
+def tier_dirs() -> dict[str, Path]:
+    return {"hot": settings.media_dir / "videos", "cold": settings.media_cold_dir}
+
+
+def owned_path(video_link: str | None) -> Path | None:
+    """Путь к видео, если файл лежит в одном из каталогов приложения."""
+    if not video_link:
+        return None
+    path = Path(video_link)
+    if any(path.is_relative_to(d) for d in tier_dirs().values()):
+        return path
+    return None
+
+
+def _owner_token() -> str:
+    return hashlib.sha256(settings.db_url.encode()).hexdigest()[:16]
+
+
+def _incident_file(path: Path) -> bool:
+    return path.name.split(".", 1)[0].isdigit()
+
+
+def orphan_sweep_state(directory: Path) -> str:
+    """Сироты удаляются только из каталога, в котором лежит `.sigma-owner` с отпечатком текущей БД."""
+    try:
+        token = (directory / OWNER_MARKER).read_text().strip()
+    except FileNotFoundError:
+        return "disabled: no owner marker"
+    return "enabled" if token == _owner_token() else "disabled: owned by another database"
+
+
+def _claim(directory: Path) -> None:
+    # занимается только каталог без маркера и без файлов инцидентов; для заполненного маркер создаётся вручную
+    marker = directory / OWNER_MARKER
+    if marker.exists() or any(_incident_file(path) for path in directory.iterdir()):
+        return
+    marker.write_text(_owner_token())
+
+
+def _remove(path: Path) -> int:
+    try:
+        size = path.stat().st_size
+        path.unlink()
+    except FileNotFoundError:
+        return 0
+    return size
+
+
+def _dir_usage(path: Path) -> dict:
+    files = size = 0
+    for entry in os.scandir(path):
+        if entry.is_file(follow_symlinks=False) and entry.name != OWNER_MARKER:
+            files += 1
+            size += entry.stat(follow_symlinks=False).st_size
+    return {"files": files, "bytes": size}
+
+
+async def _transcode(source: Path, target: Path) -> bool:
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return False
+    tmp = target.with_name(target.stem + ".tmp" + target.suffix)
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg, "-y", "-loglevel", "error", "-i", str(source),
+        "-vf", f"scale=-2:'min({settings.retention_transcode_max_height},ih)'",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", str(settings.retention_transcode_crf),
+        "-c:a", "aac", "-b:a", "64k", str(tmp),
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        tmp.unlink(missing_ok=True)
+        logger.warning("transcode of %s failed: %s", source, stderr.decode(errors="replace")[-500:])
+        return False
+    os.replace(tmp, target)
+    return True
+
+
+class RetentionSweeper:
+    """
+    Фоновая задача: раз в `interval` секунд применяет политики, удаляет файлы удалённых
+    инцидентов (`discard`) и сироты без записи в БД, обновляет счётчики занятого места.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.usage: dict[str, dict] = {}
+        self.last_sweep: dict | None = None
+        self._pending: set[Path] = set()
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    def start(self) -> None:
+        for directory in tier_dirs().values():
+            _claim(directory)
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pending:
+            await asyncio.to_thread(self._drain)
+
+    def discard(self, *paths: Path | None) -> None:
+        """Ставит файлы в очередь на удаление, не блокируя запрос."""
+        self._pending.update(p for p in paths if p is not None)
+        if self._wake is not None:
+            self._wake.set()
+
+    def snapshot(self) -> dict:
+        """Занятое видео место — на момент последнего прохода, свободное место на диске — текущее."""
+        tiers = {}
+        for tier, path in tier_dirs().items():
+            disk = shutil.disk_usage(path)
+            tiers[tier] = {
+                "path": str(path),
+                **self.usage.get(tier, {}),
+                "disk_free_bytes": disk.free,
+                "disk_total_bytes": disk.total,
+                "orphan_sweep": orphan_sweep_state(path),
+            }
+        return {"tiers": tiers, "pending_deletes": len(self._pending), "last_sweep": self.last_sweep}
+
+    async def _run(self) -> None:
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                if time.monotonic() >= deadline:
+                    await self.sweep()
+                    deadline = time.monotonic() + self.interval
+                else:
+                    await asyncio.to_thread(self._drain)
+            except Exception:
+                logger.exception("retention sweep failed")
+
+    def _drain(self) -> int:
+        freed = 0
+        while self._pending:
+            freed += _remove(self._pending.pop())
+            retention_actions_total.inc(action="discard")
+        return freed
+
+    async def sweep(self) -> dict:
+        async with self._lock:
+            return await self._sweep()
+
+    async def _sweep(self) -> dict:
+        started = time.perf_counter()
+        freed = await asyncio.to_thread(self._drain)
+        applied = dict.fromkeys((*ACTIONS, "missing", "skipped", "proxy"), 0)
+        for policy in settings.retention_policies:
+            action = policy.get("action", "delete")
+            if action not in ACTIONS:
+                logger.warning("unknown retention action %r, skipping policy %s", action, policy)
+                continue
+            for incident_iid, video_link in await self._matching(policy):
+                outcome, size = await self._apply(incident_iid, video_link, action)
+                applied[outcome] += 1
+                freed += size
+            proxies, size = await self._expire_proxies(policy)
+            applied["proxy"] += proxies
+            freed += size
+        orphans = await self._sweep_orphans()
+        self.usage = await asyncio.to_thread(self._measure)
+        self.last_sweep = {
+            "at": datetime.utcnow().isoformat(timespec="seconds"),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "applied": applied,
+            "orphans": orphans,
+            "freed_bytes": freed,
+        }
+        return self.last_sweep
+
+    @staticmethod
+    def _policy_filter(stmt, policy: dict):
+        cutoff = datetime.utcnow() - timedelta(days=float(policy.get("older_than_days", 0)))
+        stmt = stmt.where(Incident.created_at < cutoff, Incident.status.not_in(ACTIVE_STATUSES))
+        if policy.get("status") is not None:
+            stmt = stmt.where(Incident.status == policy["status"])
+        if policy.get("has_event") is not None:
+            stmt = stmt.where(Incident.has_event == bool(policy["has_event"]))
+        return stmt
+
+    @staticmethod
+    def _owned_link():
+        return or_(*(Incident.video_link.startswith(f"{d}{os.sep}") for d in tier_dirs().values()))
+
+    async def _matching(self, policy: dict) -> list[tuple[int, str]]:
+        source_tiers = ("hot", "cold") if policy.get("action", "delete") == "delete" else ("hot",)
+        stmt = (
+            self._policy_filter(select(Incident.iid, Incident.video_link), policy)
+            .where(Incident.media_tier.in_(source_tiers), self._owned_link())
+            .order_by(Incident.iid)
+            .limit(settings.retention_sweep_batch)
+        )
+        async with db.session_factory() as session:
+            rows = (await session.execute(stmt)).all()
+        return list(rows)
+
+    async def _expire_proxies(self, policy: dict) -> tuple[int, int]:
+        """
+        Прокси инцидентов, чьё видео лежит вне каталогов приложения (`INGEST_DIR`): сам файл политика
+        не трогает, а прокси в `media/videos` удаляет по тем же условиям. Возвращает число файлов и байты.
+        """
+        def scan() -> dict[int, Path]:
+            return {
+                int(path.name.split(".", 1)[0]): path
+                for path in tier_dirs()["hot"].glob("*.proxy.mp4")
+                if _incident_file(path)
+            }
+
+        proxies = await asyncio.to_thread(scan)
+        if not proxies:
+            return 0, 0
+        stmt = self._policy_filter(select(Incident.iid), policy).where(
+            Incident.iid.in_(proxies), not_(self._owned_link()),
+        )
+        async with db.session_factory() as session:
+            expired = list((await session.execute(stmt)).scalars())
+        freed = 0
+        for incident_iid in expired:
+            freed += await asyncio.to_thread(_remove, proxies[incident_iid])
+            retention_actions_total.inc(action="proxy")
+        return len(expired), freed
+
+    async def _apply(self, incident_iid: int, video_link: str, action: str) -> tuple[str, int]:
+        """Применяет действие к файлу инцидента; возвращает итог (`action`, `missing` или `skipped`) и освобождённые байты."""
+        source = owned_path(video_link)
+        target = None
+        if action != "delete" and await asyncio.to_thread(source.exists):
+            target = settings.media_cold_dir / source.name
+            if not (action == "compress" and await _transcode(source, target)):
+                await asyncio.to_thread(shutil.copy2, source, target)
+        outcome = action if action == "delete" or target is not None else "missing"
+
+        async with db.session_factory() as session:
+            incident = await session.get(Incident, incident_iid)
+            # за время перекодировки инцидент могли удалить, перенести или поставить на дозапуск
+            if incident is None or incident.video_link != video_link or incident.status in ACTIVE_STATUSES:
+                if target is not None:
+                    await asyncio.to_thread(_remove, target)
+                return "skipped", 0
+            incident.media_tier = "deleted" if target is None else "cold"
+            if target is not None:
+                incident.video_link = str(target)
+            await session.commit()
+        response_cache.invalidate_incident(incident_iid)
+        retention_actions_total.inc(action=outcome)
+
+        kept = (await asyncio.to_thread(target.stat)).st_size if target is not None else 0
+        removed = await asyncio.to_thread(_remove, source) + await asyncio.to_thread(_remove, proxy_path(incident_iid))
+        return outcome, max(0, removed - kept)
+
+    async def _sweep_orphans(self) -> int:
+        files: dict[int, list[Path]] = {}
+        grace = time.time() - settings.retention_orphan_grace_sec
+
+        def scan():
+            for directory in tier_dirs().values():
+                state = orphan_sweep_state(directory)
+                if state != "enabled":
+                    logger.warning(
+                        "orphan sweep of %s is %s; write %r into %s to enable it",
+                        directory, state, _owner_token(), directory / OWNER_MARKER,
+                    )
+                    continue
+                for path in directory.iterdir():
+                    if path.is_file() and _incident_file(path) and path.stat().st_mtime < grace:
+                        files.setdefault(int(path.name.split(".", 1)[0]), []).append(path)
+
+        await asyncio.to_thread(scan)
+        if not files:
+            return 0
+        async with db.session_factory() as session:
+            known = set((await session.execute(select(Incident.iid).where(Incident.iid.in_(files)))).scalars())
+        orphans = [path for iid, paths in files.items() if iid not in known for path in paths]
+        self.discard(*orphans)
+        await asyncio.to_thread(self._drain)
+        return len(orphans)
+
+    def _measure(self) -> dict[str, dict]:
+        usage = {tier: _dir_usage(path) for tier, path in tier_dirs().items()}
+        for tier, stats in usage.items():
+            media_bytes.set(stats["bytes"], tier=tier)
+            media_files.set(stats["files"], tier=tier)
+        return usage
+
+
+retention = RetentionSweeper(interval=settings.retention_sweep_interval_sec)
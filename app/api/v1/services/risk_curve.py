@@ -0,0 +1,50 @@
+"""
+Прореживание кривой риска по таймлайну с сохранением формы (NumPy)
+"""
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: индексы `points` точек, сохраняющих пики и провалы кривой
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, points - 1).astype(np.intp)
+    selected = np.empty(points, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean() if next_hi > next_lo else x[-1]
+        avg_y = y[next_lo:next_hi].mean() if next_hi > next_lo else y[-1]
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+
+def minmax(y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Минимум и максимум в каждой из `points // 2` равных корзин, в порядке времени
+    """
+    n = len(y)
+    buckets = points // 2
+    if points >= n or buckets < 1:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, buckets + 1).astype(np.intp)[:-1]
+    lengths = np.diff(np.append(edges, n))
+    bucket_ids = np.repeat(np.arange(buckets), lengths)
+    order = np.lexsort((y, bucket_ids))
+    ends = np.cumsum(lengths)
+    lows, highs = order[ends - lengths], order[ends - 1]
+    return np.unique(np.concatenate((lows, highs)))
+
+
+def downsample(x: np.ndarray, y: np.ndarray, points: int, method: str = "lttb") -> tuple[np.ndarray, np.ndarray]:
+    idx = lttb(x, y, points) if method == "lttb" else minmax(y, points)
+    return x[idx], y[idx]
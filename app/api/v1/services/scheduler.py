@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[None]]
+
+
+class FairScheduler:
+    """
+    Очередь фоновых задач анализа с round-robin по ключу (тенант или домен):
+    один тенант с сотней видео не блокирует остальных, пока воркеров меньше, чем задач.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._queues: dict[str, deque[Job]] = {}
+        self._order: deque[str] = deque()
+        self._ready: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+        self.running = 0
+
+    def submit(self, key: str, job: Job) -> None:
+        self._ensure_started()
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._order.append(key)
+        queue.append(job)
+        self._ready.set()
+
+    def pending(self) -> dict[str, int]:
+        return {key: len(queue) for key, queue in self._queues.items()}
+
+    def _ensure_started(self) -> None:
+        if self._tasks:
+            return
+        self._ready = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _next(self) -> Job | None:
+        if not self._order:
+            return None
+        key = self._order.popleft()
+        queue = self._queues[key]
+        job = queue.popleft()
+        if queue:
+            self._order.append(key)
+        else:
+            del self._queues[key]
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job = self._next()
+            if job is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            self.running += 1
+            try:
+                await job()
+            except Exception:
+                logger.exception("scheduled job failed")
+            finally:
+                self.running -= 1
+
+
+scheduler = FairScheduler(workers=settings.batch_workers)
@@ -0,0 +1,386 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import cv2
+import httpx
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.database import db
+from app.api.v1.events.orm import Event
+from app.api.v1.incidents.orm import Incident
+from app.api.v1.logs.orm import Log
+from app.api.v1.timelines.orm import Timeline
+from app.api.v1.services.consolidation import domain_profile, infer_domain
+from app.api.v1.stats.crud import apply_incident_rollup
+from app.api.v1.services.frame_analyzer import DOMAIN_PROMPTS, MULTI_DOMAIN_ALIASES, _analyze_window, _encode_frame_b64
+
+logger = logging.getLogger(__name__)
+
+_POLL_SEC = 0.05
+
+_streams: dict[int, "LiveStream"] = {}
+
+
+def _downscale(frame):
+    height, width = frame.shape[:2]
+    if height <= settings.analysis_proxy_max_height:
+        return frame
+    scale = settings.analysis_proxy_max_height / height
+    return cv2.resize(frame, (max(2, int(width * scale)), settings.analysis_proxy_max_height), interpolation=cv2.INTER_AREA)
+
+
+class LiveStream:
+    """
+    Непрерывный анализ живого источника (RTSP/HTTP/камера/файл) скользящими окнами.
+
+    Кадры читаются в отдельном потоке, уменьшаются до `analysis_proxy_max_height`, кодируются в JPEG
+    и кладутся в кольцевой буфер длиной `stream_buffer_sec` (с прореживанием до `llm_target_fps`),
+    поэтому память ограничена независимо от длительности потока и разрешения источника. Каждое окно анализируется сразу после того, как источник
+    его «дописал», результат пишется в `timelines`/`events` отдельной транзакцией. События склеиваются
+    на лету с тем же гистерезисом, что и для файлов: окно от `EVENT_HIGH_THRESHOLD` открывает событие,
+    соседние окна от `EVENT_LOW_THRESHOLD` (с пропуском до `EVENT_MAX_GAP_SEC`) его продлевают,
+    confidence — пиковый score. Без домена окна оцениваются по всем доменам сразу.
+    Если LLM не успевает и в работе уже `stream_max_pending` окон, новое окно
+    пропускается — задержка события не растёт вместе с очередью.
+    """
+
+    def __init__(
+        self,
+        incident_iid: int,
+        source: str | int,
+        domain: str | None,
+        progress_store: dict,
+        realtime: bool = True,
+    ):
+        self.incident_iid = incident_iid
+        self.source = source
+        self.domain_clean = (domain or "").strip("\"' ").lower()
+        self.keywords = DOMAIN_PROMPTS.get(self.domain_clean, "опасное событие, инцидент, нарушение")
+        self.multi_domain = settings.llm_multi_domain and self.domain_clean in MULTI_DOMAIN_ALIASES
+        self.progress_store = progress_store
+        self.realtime = realtime
+        self.window_sec = settings.stream_window_sec
+
+        self.ring: deque[tuple[float, str]] = deque(
+            maxlen=max(1, int(settings.stream_buffer_sec * settings.llm_target_fps)),
+        )
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.eof = False
+        self.error: str | None = None
+        self.last_ts = 0.0
+        self.cursor = 0.0
+        self.frames_read = 0
+
+        self.windows_done = 0
+        self.windows_dropped = 0
+        self.windows_failed = 0
+        self.events_found = 0
+        self.max_latency_sec = 0.0
+        self._open_events: dict[str, dict] = {}
+        self._write_lock = asyncio.Lock()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _read_frames(self) -> None:
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            self.error = f"cannot open source {self.source!r}"
+            self.eof = True
+            return
+
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25
+        is_file = cap.get(cv2.CAP_PROP_FRAME_COUNT) > 0
+        step = max(1, round(fps / settings.llm_target_fps))
+        started = time.monotonic()
+        n = 0
+        try:
+            while not self._stop.is_set():
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                ts = n / fps if is_file else time.monotonic() - started
+                n += 1
+                if is_file and self.realtime:
+                    delay = started + ts - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                elif is_file:
+                    while ts - self.cursor > settings.stream_buffer_sec and not self._stop.is_set():
+                        time.sleep(_POLL_SEC)
+                if (n - 1) % step:
+                    continue
+                encoded = _encode_frame_b64(_downscale(frame))
+                with self._lock:
+                    self.ring.append((ts, encoded))
+                self.last_ts = ts
+                self.frames_read = n
+        finally:
+            cap.release()
+            self.eof = True
+
+    def _window_frames(self, start: float, end: float, n: int) -> list[str]:
+        with self._lock:
+            frames = [frame for ts, frame in self.ring if start <= ts < end]
+        if len(frames) <= n:
+            return frames
+        return [frames[round(i * (len(frames) - 1) / max(n - 1, 1))] for i in range(n)]
+
+    def _report(self, status: str = "STREAMING") -> None:
+        self.progress_store[self.incident_iid] = {
+            "status": status,
+            "stream_time_sec": round(self.last_ts, 2),
+            "windows_done": self.windows_done,
+            "windows_dropped": self.windows_dropped,
+            "windows_failed": self.windows_failed,
+            "events_found": self.events_found,
+            "max_latency_sec": round(self.max_latency_sec, 2),
+        }
+
+    async def _process_window(
+        self,
+        client: httpx.AsyncClient,
+        window_idx: int,
+        start: float,
+        end: float,
+        frames_b64: list[str],
+        closed_at: float,
+    ) -> None:
+        try:
+            r = await asyncio.wait_for(
+                _analyze_window(
+                    client, window_idx, start, end, frames_b64, self.keywords, self.domain_clean, self.multi_domain,
+                    fair_key=f"stream:{self.incident_iid}",
+                ),
+                timeout=settings.stream_window_timeout_sec,
+            )
+        except Exception:
+            self.windows_failed += 1
+            self._report()
+            return
+
+        has_event = r["has_event"]
+        event_type = self.domain_clean
+        if r["domain_scores"]:
+            event_type = max(r["domain_scores"].items(), key=lambda item: item[1])[0]
+        async with self._write_lock, db.session_factory() as session:
+            if await session.get(Incident, self.incident_iid) is None:
+                self.stop()
+                return
+            session.add(Timeline(
+                incident_iid=self.incident_iid,
+                window_idx=window_idx,
+                timestamp_sec=round(start, 2),
+                interval_end_sec=round(end, 2),
+                label="EVENT" if has_event else "SAFE",
+                has_event=has_event,
+                caption=r["description"],
+                risk_score=r["risk_score"],
+                event_type=event_type if has_event else "safe",
+                domain_scores=r["domain_scores"],
+            ))
+            await self._update_events(session, start, end, r, event_type)
+            await session.commit()
+
+        self.windows_done += 1
+        self.max_latency_sec = max(self.max_latency_sec, time.monotonic() - closed_at)
+        self._report()
+
+    def _window_scores(self, r: dict, event_type: str) -> dict[str, float]:
+        # как в consolidate_events: has_event модели открывает событие даже при заниженном risk_score
+        high = settings.event_high_threshold
+        if r["domain_scores"]:
+            series = {d: (score, r["has_event"] and d == event_type) for d, score in r["domain_scores"].items()}
+        else:
+            series = {self.domain_clean or "event": (r["risk_score"], r["has_event"])}
+        return {d: min(1.0, max(score, high) if flagged else score) for d, (score, flagged) in series.items()}
+
+    async def _update_events(self, session, start: float, end: float, r: dict, event_type: str) -> None:
+        for domain, score in self._window_scores(r, event_type).items():
+            current = self._open_events.get(domain)
+            near = current is not None and (
+                start <= current["end"] + settings.event_max_gap_sec and end >= current["start"] - settings.event_max_gap_sec
+            )
+            if near and score >= settings.event_low_threshold:
+                current["start"], current["end"] = min(current["start"], start), max(current["end"], end)
+                values = {"start_time": round(current["start"], 2), "end_time": round(current["end"], 2)}
+                if score > current["confidence"]:
+                    current["confidence"] = score
+                    values.update({
+                        "confidence": round(score, 3),
+                        "description": r["description"],
+                        "highlight": f"{round(start, 2)}-{round(end, 2)}",
+                    })
+                await session.execute(update(Event).where(Event.iid == current["iid"]).values(**values))
+            elif score >= settings.event_high_threshold:
+                event = Event(
+                    incident_iid=self.incident_iid,
+                    event_type=domain,
+                    start_time=round(start, 2),
+                    end_time=round(end, 2),
+                    confidence=round(score, 3),
+                    description=r["description"],
+                    highlight=f"{round(start, 2)}-{round(end, 2)}",
+                )
+                session.add(event)
+                await session.flush()
+                self._open_events[domain] = {"iid": event.iid, "start": start, "end": end, "confidence": score}
+                self.events_found += 1
+
+    async def run(self) -> None:
+        reader = asyncio.create_task(asyncio.to_thread(self._read_frames))
+        pending: set[asyncio.Task] = set()
+        window_idx = 0
+        start = 0.0
+        self._report()
+
+        try:
+            async with httpx.AsyncClient(timeout=httpx.Timeout(connect=10.0, read=120.0, write=30.0, pool=10.0)) as client:
+                while True:
+                    end = start + self.window_sec
+                    while self.last_ts < end and not self.eof:
+                        await asyncio.sleep(_POLL_SEC)
+                    if self.eof and self.last_ts < start:
+                        break
+
+                    end = min(end, self.last_ts) if self.eof else end
+                    frames = self._window_frames(start, end + 1e-6 if self.eof else end, settings.llm_frames_per_window)
+                    self.cursor = end
+                    if frames and len(pending) >= settings.stream_max_pending:
+                        self.windows_dropped += 1
+                        self._report()
+                    elif frames:
+                        task = asyncio.create_task(
+                            self._process_window(client, window_idx, start, end, frames, time.monotonic()),
+                        )
+                        pending.add(task)
+                        task.add_done_callback(pending.discard)
+
+                    window_idx += 1
+                    start = end
+                    if self.eof and self.last_ts <= start:
+                        break
+
+                await reader
+                await asyncio.gather(*pending, return_exceptions=True)
+        except Exception as exc:
+            logger.exception("stream %s failed", self.incident_iid)
+            self.error = self.error or repr(exc)
+            for task in pending:
+                task.cancel()
+        finally:
+            self._stop.set()
+
+        status = "ERROR" if self.error else "DONE"
+        async with db.session_factory() as session:
+            incident = await session.get(Incident, self.incident_iid)
+            if incident is None:
+                self._report(status)
+                return
+            analysis = await self._analysis(session)
+            incident.status = status
+            incident.has_event = analysis["has_event"]
+            incident.inferred_domain = analysis["inferred_domain"]
+            incident.analysis_json = json.dumps(analysis, ensure_ascii=False)
+            incident.duration_sec = round(self.last_ts, 2)
+            incident.num_frames = self.frames_read
+            incident.num_windows = window_idx
+            incident.model_version = settings.model_version
+            incident.prompt_version = settings.prompt_version
+            # тот же вклад в дневные агрегаты, что и у загруженного видео; rebuild_rollups читает analysis_json
+            await apply_incident_rollup(session, incident)
+            session.add(Log(
+                incident_iid=self.incident_iid,
+                event="STREAM_STOP" if status == "DONE" else "ERROR",
+                model_version=settings.model_version,
+                prompt_version=settings.prompt_version,
+            ))
+            await session.commit()
+
+        self._report(status)
+        if self.error:
+            self.progress_store[self.incident_iid]["error"] = self.error
+
+
+    async def _analysis(self, session) -> dict:
+        """`analysis_json` потока в том же виде, что у загруженного видео — по записанным окнам и событиям."""
+        timeline = [
+            {
+                "window_idx": w.window_idx,
+                "timestamp_sec": w.timestamp_sec,
+                "interval_end_sec": w.interval_end_sec,
+                "label": w.label,
+                "has_event": w.has_event,
+                "caption": w.caption,
+                "risk_score": w.risk_score,
+                "event_type": w.event_type,
+                **({"domain_scores": w.domain_scores} if w.domain_scores else {}),
+            }
+            for w in (await session.execute(
+                select(Timeline).where(Timeline.incident_iid == self.incident_iid).order_by(Timeline.window_idx)
+            )).scalars()
+        ]
+        events = []
+        for e in (await session.execute(
+            select(Event).where(Event.incident_iid == self.incident_iid).order_by(Event.start_time)
+        )).scalars():
+            highlight_start, _, highlight_end = e.highlight.partition("-")
+            events.append({
+                "has_event": True,
+                "event_type": e.event_type,
+                "interval_start_sec": e.start_time,
+                "interval_end_sec": e.end_time,
+                "confidence": e.confidence,
+                "description": e.description,
+                "highlight_start_sec": float(highlight_start or e.start_time),
+                "highlight_end_sec": float(highlight_end or e.end_time),
+            })
+        metadata = {"duration_sec": round(self.last_ts, 2), "num_frames": self.frames_read, "stream": True}
+        if self.multi_domain:
+            profile = domain_profile(timeline, list(DOMAIN_PROMPTS))
+            inferred_domain = infer_domain(profile)
+            metadata.update({"multi_domain": True, "domain_scores": profile})
+        else:
+            inferred_domain = self.domain_clean or "other"
+        return {
+            "status": "completed",
+            "inferred_domain": inferred_domain,
+            "has_event": bool(events),
+            "events": events,
+            "timeline": timeline,
+            "metadata": metadata,
+        }
+
+
+def start_stream(
+    incident_iid: int,
+    source: str | int,
+    domain: str | None,
+    progress_store: dict,
+    realtime: bool = True,
+) -> LiveStream:
+    stream = LiveStream(incident_iid, source, domain, progress_store, realtime=realtime)
+    task = asyncio.create_task(stream.run())
+    _streams[incident_iid] = stream
+    task.add_done_callback(lambda t: _on_stream_done(incident_iid, t))
+    return stream
+
+
+def _on_stream_done(incident_iid: int, task: asyncio.Task) -> None:
+    _streams.pop(incident_iid, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("stream %s task failed: %r", incident_iid, task.exception())
+
+
+def stop_stream(incident_iid: int) -> bool:
+    stream = _streams.get(incident_iid)
+    if stream is None:
+        return False
+    stream.stop()
+    return True
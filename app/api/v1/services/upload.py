@@ -11,6 +11,8 @@ ALLOWED_CONTENT_TYPES = {
     "video/x-matroska",
 }
 
+ALLOWED_EXTENSIONS = {".mp4", ".webm", ".mov", ".avi", ".mpeg", ".mpg", ".mkv"}
+
 MAX_FILE_SIZE_BYTES = 500 * 1024 * 1024  # 500 MB
 
 
@@ -22,6 +24,27 @@ def validate_content_type(file: UploadFile) -> None:
         )
 
 
+def resolve_ingest_path(raw: str, root: Path) -> Path:
+    root = root.resolve()
+    path = (root / raw).resolve()
+    if not path.is_relative_to(root):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Path '{raw}' is outside of the ingest directory",
+        )
+    if not path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"File '{raw}' not found in the ingest directory",
+        )
+    if path.suffix.lower() not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported file extension '{path.suffix}'. Allowed: mp4, webm, mov, avi, mpeg, mkv",
+        )
+    return path
+
+
 async def save_upload_file(file: UploadFile, destination: Path) -> int:
     total = 0
     async with aiofiles.open(destination, "wb") as f:
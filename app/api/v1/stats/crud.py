@@ -0,0 +1,140 @@
+import json
+from collections import Counter
+from datetime import date, datetime
+
+from sqlalchemy import Connection, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .orm import DailyEventTypeRollup, DailyRollup
+from app.api.v1.incidents.orm import Incident
+
+ROLLUP_FIELDS = (
+    "incidents", "incidents_with_events", "events", "windows", "risk_sum", "processed", "processing_sec_sum",
+)
+
+
+def _insert(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _day(created_at: datetime | str | None) -> date:
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    return (created_at or datetime.utcnow()).date()
+
+
+def incident_rollup(analysis: dict, processing_sec: float | None) -> tuple[dict, Counter]:
+    """
+    Вклад одного проанализированного инцидента в дневные агрегаты
+    """
+    timeline = analysis.get("timeline") or []
+    events = analysis.get("events") or []
+    totals = {
+        "incidents": 1,
+        "incidents_with_events": int(bool(analysis.get("has_event") or events)),
+        "events": len(events),
+        "windows": len(timeline),
+        "risk_sum": float(sum(w.get("risk_score") or 0.0 for w in timeline)),
+        "processed": int(processing_sec is not None),
+        "processing_sec_sum": float(processing_sec or 0.0),
+    }
+    return totals, Counter(e.get("event_type") or "event" for e in events)
+
+
+async def apply_incident_rollup(session: AsyncSession, incident: Incident, sign: int = 1) -> None:
+    """
+    Добавляет (`sign=1`) или вычитает (`sign=-1`) текущее состояние инцидента из агрегатов.
+    Коммит — на вызывающей стороне, вместе с изменением самого инцидента.
+    """
+    if not incident.analysis_json:
+        return
+    totals, by_type = incident_rollup(json.loads(incident.analysis_json), incident.processing_sec)
+    key = {"day": _day(incident.created_at), "domain": incident.inferred_domain or "unknown"}
+    insert = _insert(session.get_bind().dialect.name)
+
+    values = {k: v * sign for k, v in totals.items()}
+    stmt = insert(DailyRollup).values(**key, **values)
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=["day", "domain"],
+        set_={k: getattr(DailyRollup, k) + stmt.excluded[k] for k in ROLLUP_FIELDS},
+    ))
+    for event_type, count in by_type.items():
+        stmt = insert(DailyEventTypeRollup).values(**key, event_type=event_type, events=count * sign)
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=["day", "domain", "event_type"],
+            set_={"events": DailyEventTypeRollup.events + stmt.excluded.events},
+        ))
+
+    if sign < 0:
+        await session.execute(delete(DailyRollup).where(
+            DailyRollup.day == key["day"], DailyRollup.domain == key["domain"], DailyRollup.incidents <= 0,
+        ))
+        await session.execute(delete(DailyEventTypeRollup).where(
+            DailyEventTypeRollup.day == key["day"],
+            DailyEventTypeRollup.domain == key["domain"],
+            DailyEventTypeRollup.events <= 0,
+        ))
+
+
+def rebuild_rollups(conn: Connection, yield_per: int = 500) -> int:
+    """
+    Пересчёт агрегатов с нуля по `incidents.analysis_json`; возвращает число учтённых инцидентов.
+    """
+    daily: dict[tuple, dict] = {}
+    by_type: Counter = Counter()
+    stmt = (
+        select(Incident.created_at, Incident.inferred_domain, Incident.processing_sec, Incident.analysis_json)
+        .where(Incident.analysis_json.is_not(None))
+        .execution_options(yield_per=yield_per)
+    )
+    counted = 0
+    for created_at, domain, processing_sec, analysis_json in conn.execute(stmt):
+        key = (_day(created_at), domain or "unknown")
+        totals, types = incident_rollup(json.loads(analysis_json), processing_sec)
+        row = daily.setdefault(key, dict.fromkeys(ROLLUP_FIELDS, 0))
+        for field, value in totals.items():
+            row[field] += value
+        for event_type, count in types.items():
+            by_type[(*key, event_type)] += count
+        counted += 1
+
+    conn.execute(delete(DailyEventTypeRollup))
+    conn.execute(delete(DailyRollup))
+    if daily:
+        conn.execute(DailyRollup.__table__.insert(), [
+            {"day": day, "domain": domain, **row} for (day, domain), row in daily.items()
+        ])
+    if by_type:
+        conn.execute(DailyEventTypeRollup.__table__.insert(), [
+            {"day": day, "domain": domain, "event_type": event_type, "events": count}
+            for (day, domain, event_type), count in by_type.items()
+        ])
+    return counted
+
+
+def _filtered(stmt, model, date_from: date | None, date_to: date | None, domain: str | None):
+    if date_from is not None:
+        stmt = stmt.where(model.day >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(model.day <= date_to)
+    if domain is not None:
+        stmt = stmt.where(model.domain == domain)
+    return stmt
+
+
+async def get_rollups(
+    session: AsyncSession,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    domain: str | None = None,
+) -> tuple[list[DailyRollup], list[DailyEventTypeRollup]]:
+    daily = _filtered(select(DailyRollup), DailyRollup, date_from, date_to, domain)
+    types = _filtered(select(DailyEventTypeRollup), DailyEventTypeRollup, date_from, date_to, domain)
+    return (
+        list((await session.execute(daily.order_by(DailyRollup.day, DailyRollup.domain))).scalars().all()),
+        list((await session.execute(types)).scalars().all()),
+    )
@@ -0,0 +1,31 @@
+from datetime import date
+
+from sqlalchemy import Date, Float, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.api.v1.base_model import Base
+
+
+class DailyRollup(Base):
+    __tablename__ = "rollup_daily"
+    __table_args__ = (UniqueConstraint("day", "domain"),)
+
+    day: Mapped[date] = mapped_column(Date)
+    domain: Mapped[str] = mapped_column(String(50))
+    incidents: Mapped[int] = mapped_column(default=0)
+    incidents_with_events: Mapped[int] = mapped_column(default=0)
+    events: Mapped[int] = mapped_column(default=0)
+    windows: Mapped[int] = mapped_column(default=0)
+    risk_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    processed: Mapped[int] = mapped_column(default=0)
+    processing_sec_sum: Mapped[float] = mapped_column(Float, default=0.0)
+
+
+class DailyEventTypeRollup(Base):
+    __tablename__ = "rollup_daily_event_types"
+    __table_args__ = (UniqueConstraint("day", "domain", "event_type"),)
+
+    day: Mapped[date] = mapped_column(Date)
+    domain: Mapped[str] = mapped_column(String(50))
+    event_type: Mapped[str] = mapped_column(String(50))
+    events: Mapped[int] = mapped_column(default=0)
@@ -0,0 +1,19 @@
+"""
+Пересчёт аналитических агрегатов с нуля: python -m app.api.v1.stats.rebuild
+"""
+import asyncio
+
+from app.database import db
+from .crud import rebuild_rollups
+
+
+async def rebuild() -> int:
+    try:
+        async with db.engine.begin() as conn:
+            return await conn.run_sync(rebuild_rollups)
+    finally:
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    print(f"rollups rebuilt from {asyncio.run(rebuild())} incidents")
@@ -0,0 +1,56 @@
+from collections import defaultdict
+from datetime import date
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import db
+from app.utils.structures import Status, resp
+from . import crud
+from .crud import ROLLUP_FIELDS
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+
+def _summary(row: dict, by_type: dict[str, int]) -> dict:
+    return {
+        "incidents": row["incidents"],
+        "incidents_with_events": row["incidents_with_events"],
+        "events": row["events"],
+        "events_by_type": by_type,
+        "mean_risk_score": round(row["risk_sum"] / row["windows"], 4) if row["windows"] else None,
+        "mean_processing_sec": round(row["processing_sec_sum"] / row["processed"], 2) if row["processed"] else None,
+    }
+
+
+@router.get(
+    "/",
+    summary="Сводная аналитика",
+    description=(
+        "Число инцидентов, событий по `event_type`, средний `risk_score` и время обработки "
+        "по дням и `inferred_domain`. Читает только предрасчитанные агрегаты, а не таймлайны и события."
+    ),
+)
+async def get_stats(
+    session: AsyncSession = Depends(db.read_session_dependency),
+    date_from: date | None = Query(default=None, description="С даты (включительно)"),
+    date_to: date | None = Query(default=None, description="По дату (включительно)"),
+    domain: str | None = Query(default=None, description="Фильтр по inferred_domain"),
+):
+    daily, event_types = await crud.get_rollups(session, date_from=date_from, date_to=date_to, domain=domain)
+
+    types_by_key: dict[tuple, dict[str, int]] = defaultdict(dict)
+    total_types: dict[str, int] = defaultdict(int)
+    for t in event_types:
+        types_by_key[(t.day, t.domain)][t.event_type] = t.events
+        total_types[t.event_type] += t.events
+
+    total = dict.fromkeys(ROLLUP_FIELDS, 0)
+    days = []
+    for r in daily:
+        row = {field: getattr(r, field) for field in ROLLUP_FIELDS}
+        for field in ROLLUP_FIELDS:
+            total[field] += row[field]
+        days.append({"day": r.day, "domain": r.domain, **_summary(row, types_by_key[(r.day, r.domain)])})
+
+    return resp(Status.OK, {"total": _summary(total, dict(total_types)), "days": days})
@@ -1,18 +1,31 @@
-from sqlalchemy import select
+from sqlalchemy import Row, Select, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .orm import Timeline
 
 
-async def get_timelines(
+def _timelines_stmt(stmt: Select, incident_iid: int | None, limit: int, offset: int) -> Select:
+    if incident_iid is not None:
+        stmt = stmt.where(Timeline.incident_iid == incident_iid)
+    return stmt.order_by(Timeline.window_idx).limit(limit).offset(offset)
+
+
+async def get_timeline_rows(
     session: AsyncSession,
     incident_iid: int | None = None,
     limit: int = 200,
     offset: int = 0,
-) -> list[Timeline]:
-    stmt = select(Timeline)
-    if incident_iid is not None:
-        stmt = stmt.where(Timeline.incident_iid == incident_iid)
-    stmt = stmt.order_by(Timeline.window_idx).limit(limit).offset(offset)
+) -> tuple[list[str], list[Row]]:
+    stmt = _timelines_stmt(select(*Timeline.__table__.columns), incident_iid, limit, offset)
+    result = await session.execute(stmt)
+    return list(result.keys()), list(result.all())
+
+
+async def get_risk_series(session: AsyncSession, incident_iid: int) -> list[Row]:
+    stmt = (
+        select(Timeline.timestamp_sec, Timeline.risk_score)
+        .where(Timeline.incident_iid == incident_iid)
+        .order_by(Timeline.window_idx)
+    )
     result = await session.execute(stmt)
-    return list(result.scalars().all())
+    return list(result.all())
@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey, String, Float
+from sqlalchemy import JSON, ForeignKey, String, Float
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.api.v1.base_model import Base
@@ -14,5 +14,6 @@ class Timeline(Base):
     caption: Mapped[str] = mapped_column(String(512), default="")
     risk_score: Mapped[float] = mapped_column(Float, default=0.0)
     event_type: Mapped[str] = mapped_column(String(50), default="")
+    domain_scores: Mapped[dict[str, float] | None] = mapped_column(JSON, nullable=True)
 
     incident: Mapped["Incident"] = relationship(back_populates="timelines")
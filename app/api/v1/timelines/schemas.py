@@ -12,6 +12,7 @@ class TimelineBase(BaseModel):
     caption: str = ""
     risk_score: float = 0.0
     event_type: str = ""
+    domain_scores: Optional[dict[str, float]] = None
 
 
 class TimelineCreate(TimelineBase):
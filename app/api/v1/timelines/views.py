@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import db
-from app.utils.structures import Status, resp
+from app.utils.cache import response_cache
+from app.api.v1.incidents.crud import get_incident_status
+from app.utils.structures import json_response, resp_rows
 from . import crud
-from .schemas import Timeline as TimelineSchema
 
 router = APIRouter(prefix="/timelines", tags=["Timelines"])
 
@@ -18,10 +19,20 @@ router = APIRouter(prefix="/timelines", tags=["Timelines"])
     ),
 )
 async def list_timelines(
-    session: AsyncSession = Depends(db.scoped_session_dependency),
+    request: Request,
+    session: AsyncSession = Depends(db.read_session_dependency),
     incident_iid: int | None = Query(default=None, description="Фильтр по инциденту"),
     limit: int = Query(default=200, ge=1, le=500),
     offset: int = Query(default=0, ge=0),
 ):
-    timelines = await crud.get_timelines(session, incident_iid=incident_iid, limit=limit, offset=offset)
-    return resp(Status.OK, [TimelineSchema.model_validate(t).model_dump() for t in timelines])
+    cache_key = f"timelines:{incident_iid}:{limit}:{offset}"
+    if incident_iid is not None and (cached := response_cache.get(cache_key)) is not None:
+        return cached.to_response(request)
+
+    # статус читаем до данных: если инцидент уже DONE, прочитанные строки окончательные
+    final = incident_iid is not None and await get_incident_status(session, incident_iid) == "DONE"
+    keys, rows = await crud.get_timeline_rows(session, incident_iid=incident_iid, limit=limit, offset=offset)
+    body = resp_rows(keys, rows)
+    if final:
+        return response_cache.put(cache_key, incident_iid, body).to_response(request)
+    return json_response(body)
@@ -1,4 +1,5 @@
 from pathlib import Path
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 BASE_DIR = Path(__file__).parent.parent
@@ -18,8 +19,21 @@ class Settings(BaseSettings):
 
     db_url: str = f"sqlite+aiosqlite:///{BASE_DIR}/sigma.db"
     db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_auto_migrate: bool = True
+    db_replica_urls: list[str] = []
+    db_replica_retry_sec: float = 30.0
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
 
     media_dir: Path = BASE_DIR / "media"
+    media_cold_dir: Path | None = None
 
     model_version: str = "stub-v1.0"
     prompt_version: str = "v1.0"
@@ -31,10 +45,77 @@ class Settings(BaseSettings):
     llm_target_fps: int = 10
     llm_frames_per_window: int = 5
     llm_max_highlights: int = 10
+    llm_multi_domain: bool = True
+    llm_initial_concurrency: int = 4
+    llm_min_concurrency: int = 1
+    llm_max_concurrency: int = 32
+    llm_latency_tolerance: float = 2.0
+    llm_backoff_ratio: float = 0.7
+    llm_retry_attempts: int = 4
+    llm_retry_base_sec: float = 1.0
+    llm_retry_max_sec: float = 30.0
+    llm_breaker_failures: int = 5
+    llm_breaker_reset_sec: float = 30.0
+
+    analysis_proxy: bool = True
+    analysis_proxy_max_height: int = 480
+    analysis_proxy_crf: int = 28
+
+    timeline_commit_batch: int = 10
+
+    event_high_threshold: float = 0.6
+    event_low_threshold: float = 0.3
+    event_max_gap_sec: float = 2.0
+    event_nms_iou: float = 0.3
+
+    prefilter: str = ""
+    prefilter_mode: str = "gate"
+    prefilter_thresholds: dict[str, float] = {"traffic": 0.005, "production": 0.004, "violence": 0.006}
+    prefilter_default_threshold: float = 0.005
+    prefilter_dnn_model: str = ""
+    prefilter_dnn_input_size: int = 224
+
+    batch_workers: int = 2
+    batch_max_files: int = 500
+    ingest_dir: Path = BASE_DIR / "media" / "ingest"
+
+    response_cache_max_entries: int = 1024
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    response_cache_control: str = "private, max-age=60"
+    report_prerender_formats: list[str] = ["docx"]
+    export_batch_size: int = 1000
+
+    retention_policies: list[dict] = []
+    retention_sweep_interval_sec: float = 3600.0
+    retention_sweep_batch: int = 100
+    retention_orphan_grace_sec: float = 3600.0
+    retention_transcode_crf: int = 30
+    retention_transcode_max_height: int = 720
+
+    loop_monitor_interval_ms: float = 100.0
+    loop_lag_threshold_ms: float = 100.0
+    loop_monitor_debug: bool = False
+    loop_monitor_max_reports: int = 50
+
+    stream_window_sec: float = 2.0
+    stream_buffer_sec: float = 10.0
+    stream_max_pending: int = 4
+    stream_window_timeout_sec: float = 30.0
+    stream_allowed_schemes: list[str] = ["rtsp", "rtsps", "http", "https"]
 
     model_config = {"env_file": ".env"}
 
+    @model_validator(mode="after")
+    def _default_cold_dir(self):
+        # холодный уровень по умолчанию следует за MEDIA_DIR
+        if self.media_cold_dir is None:
+            self.media_cold_dir = self.media_dir / "cold"
+        return self
+
 
 settings = Settings()
 settings.media_dir.mkdir(parents=True, exist_ok=True)
 (settings.media_dir / "videos").mkdir(exist_ok=True)
+(settings.media_dir / "reports").mkdir(exist_ok=True)
+settings.ingest_dir.mkdir(parents=True, exist_ok=True)
+settings.media_cold_dir.mkdir(parents=True, exist_ok=True)
@@ -1,6 +1,10 @@
 from asyncio import current_task
+from time import monotonic
 
+from sqlalchemy import URL, event, make_url, text
+from sqlalchemy.exc import DBAPIError, OperationalError, ProgrammingError
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     create_async_engine,
     async_sessionmaker,
@@ -9,15 +13,61 @@ from sqlalchemy.ext.asyncio import (
 
 from app.config import settings
 
+# реплика годится для чтения, только если на ней есть схема не старше `replica_schema_version`
+_REPLICA_PROBE = text("SELECT MAX(version) FROM schema_version")
+
 
 class Database:
-    def __init__(self, url: str, echo: bool = False):
-        self.engine = create_async_engine(
-            url=url,
+    def __init__(
+        self,
+        url: str,
+        echo: bool = False,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_recycle: int = -1,
+        pool_pre_ping: bool = False,
+        replica_urls: list[str] | None = None,
+        replica_retry_sec: float = 30.0,
+    ):
+        self.pool_options = {
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": pool_timeout,
+            "pool_recycle": pool_recycle,
+            "pool_pre_ping": pool_pre_ping,
+        }
+        self.engine = self._create_engine(url, echo)
+        self.session_factory = self._create_session_factory(self.engine)
+
+        self.replica_engines = [
+            self._create_engine(replica_url, echo, readonly=True) for replica_url in replica_urls or []
+        ]
+        self.replica_session_factories = [self._create_session_factory(e) for e in self.replica_engines]
+        self.replica_retry_sec = replica_retry_sec
+        self._replica_down_until = [0.0] * len(self.replica_engines)
+        self._replica_checked_until = [0.0] * len(self.replica_engines)
+        self._next_replica = 0
+        self.replica_schema_version = 0
+
+    def _create_engine(self, url: str, echo: bool, readonly: bool = False) -> AsyncEngine:
+        parsed = make_url(url)
+        is_sqlite = parsed.get_backend_name() == "sqlite"
+        if is_sqlite and readonly:
+            parsed = _readonly_sqlite_url(parsed)
+        engine = create_async_engine(
+            url=parsed,
             echo=echo,
+            **({} if is_sqlite else self.pool_options),
         )
-        self.session_factory = async_sessionmaker(
-            bind=self.engine,
+        if is_sqlite:
+            event.listen(engine.sync_engine, "connect", _set_sqlite_read_pragmas if readonly else _set_sqlite_pragmas)
+        return engine
+
+    @staticmethod
+    def _create_session_factory(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+        return async_sessionmaker(
+            bind=engine,
             autoflush=False,
             autocommit=False,
             expire_on_commit=False,
@@ -33,15 +83,110 @@ class Database:
     async def session_dependency(self) -> AsyncSession:
         async with self.session_factory() as session:
             yield session
-            await session.close()
 
     async def scoped_session_dependency(self) -> AsyncSession:
         session = self.get_scoped_session()
-        yield session
-        await session.close()
+        try:
+            yield session
+        finally:
+            # HTTPException из эндпоинта не должна оставлять открытую транзакцию сборщику мусора
+            await session.close()
+
+    async def open_read_session(self) -> AsyncSession:
+        """
+        Сессия для чтения: реплики по кругу, недоступная реплика или реплика без актуальной схемы
+        пропускается на `replica_retry_sec`, если живых реплик нет — основная БД. Удачная проверка схемы
+        действует те же `replica_retry_sec`, до ошибки запроса на реплике.
+        Реплики асинхронные, поэтому только что записанные данные могут появиться с задержкой.
+        """
+        for _ in range(len(self.replica_session_factories)):
+            idx = self._next_replica
+            self._next_replica = (idx + 1) % len(self.replica_session_factories)
+            now = monotonic()
+            if self._replica_down_until[idx] > now:
+                continue
+            session = self.replica_session_factories[idx]()
+            session.info["replica"] = idx
+            if self._replica_checked_until[idx] > now:
+                return session
+            try:
+                version = (await session.execute(_REPLICA_PROBE)).scalar() or 0
+            except (DBAPIError, OSError):
+                version = -1
+            if version >= self.replica_schema_version:
+                self._replica_checked_until[idx] = now + self.replica_retry_sec
+                return session
+            await session.close()
+            self._mark_replica_down(idx)
+        return self.session_factory()
+
+    def _mark_replica_down(self, idx: int) -> None:
+        self._replica_down_until[idx] = monotonic() + self.replica_retry_sec
+        self._replica_checked_until[idx] = 0.0
+
+    async def read_session_dependency(self) -> AsyncSession:
+        session = await self.open_read_session()
+        try:
+            yield session
+        except (OperationalError, ProgrammingError, OSError):
+            # реплика отвечает, но запрос на ней падает — следующие чтения идут мимо неё
+            if (idx := session.info.get("replica")) is not None:
+                self._mark_replica_down(idx)
+            raise
+        finally:
+            await session.close()
+
+    def pool_status(self) -> dict:
+        stats = _pool_stats(self.engine)
+        if self.replica_engines:
+            stats["replicas"] = [
+                {**_pool_stats(engine), "available": self._replica_down_until[idx] <= monotonic()}
+                for idx, engine in enumerate(self.replica_engines)
+            ]
+        return stats
+
+
+def _pool_stats(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+    stats = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    return stats
+
+
+def _readonly_sqlite_url(url: URL) -> URL:
+    # mode=ro: несуществующий файл реплики не создаётся пустым, а даёт ошибку подключения
+    if not url.database or url.database == ":memory:" or url.database.startswith("file:"):
+        return url
+    return url.set(database=f"file:{url.database}", query={**url.query, "mode": "ro", "uri": "true"})
+
+
+def _set_sqlite_read_pragmas(dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.close()
+
+
+def _set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    # WAL: читатели не блокируют писателя, фоновые задачи и API-запросы пишут без "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.close()
 
 
 db = Database(
     url=settings.db_url,
     echo=settings.db_echo,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    replica_urls=settings.db_replica_urls,
+    replica_retry_sec=settings.db_replica_retry_sec,
 )
@@ -1,11 +1,28 @@
+import logging
+import time
+
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 
-from app.utils.structures import Status, resp
+from app.utils import metrics
+from app.utils.cache import response_cache
+from app.utils.loop_monitor import loop_monitor
+from app.utils.structures import ORJSONResponse, Status, resp
 from app.config import settings
 from app.database import db
-from app.api.v1.base_model import Base
+from app.migrations import LATEST_VERSION, migrate, schema_version
 from app.api.v1 import router as api_v1_router
+from app.api.v1.services.limiter import llm_limiter
+from app.api.v1.services.retention import retention
+
+_imports_done = time.perf_counter()
+
+logger = logging.getLogger("uvicorn.error")
+
+startup_ms: dict[str, float] = {}
 
 OPENAPI_TAGS = [
     {
@@ -40,14 +57,49 @@ OPENAPI_TAGS = [
             "Фиксирует версию модели и промптов для воспроизводимости."
         ),
     },
+    {
+        "name": "Exports",
+        "description": (
+            "Потоковая выгрузка событий, таймлайнов и логов в NDJSON / CSV / Parquet "
+            "без пагинации: `GET /exports/timelines?format=csv&gzip=true`."
+        ),
+    },
+    {
+        "name": "Stats",
+        "description": (
+            "Сводная аналитика по дням и доменам из агрегатов, обновляемых при сохранении "
+            "и удалении инцидентов. Пересчёт с нуля: `python -m app.api.v1.stats.rebuild`."
+        ),
+    },
 ]
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with db.engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    lifespan_started = time.perf_counter()
+    timings = {"imports": _imports_done - _import_started}
+
+    started = time.perf_counter()
+    version = await schema_version(db.engine)
+    timings["schema_check"] = time.perf_counter() - started
+    if version < LATEST_VERSION:
+        if not settings.db_auto_migrate:
+            raise RuntimeError(f"schema version {version} < {LATEST_VERSION}, run `python -m app.migrations`")
+        started = time.perf_counter()
+        applied = await migrate(db.engine)
+        timings["migrations"] = time.perf_counter() - started
+        logger.info("applied migrations: %s", ", ".join(applied))
+    db.replica_schema_version = LATEST_VERSION
+
+    loop_monitor.start()
+    retention.start()
+    timings["lifespan"] = time.perf_counter() - lifespan_started
+    timings["total"] = time.perf_counter() - _import_started
+    startup_ms.update({k: round(v * 1000, 1) for k, v in timings.items()})
+    logger.info("startup: %s", ", ".join(f"{k}={v:.0f}ms" for k, v in startup_ms.items()))
     yield
+    await retention.stop()
+    await loop_monitor.stop()
 
 
 app = FastAPI(
@@ -55,6 +107,7 @@ app = FastAPI(
     title=settings.app_name,
     description=settings.app_description,
     openapi_tags=OPENAPI_TAGS,
+    default_response_class=ORJSONResponse,
     version="1.0.0",
 )
 
@@ -63,7 +116,25 @@ app.include_router(api_v1_router, prefix=settings.api_v1_prefix)
 
 @app.get("/health")
 def get_health():
-    return resp(Status.OK, {"name": settings.app_name, "db_echo": settings.db_echo})
+    return resp(Status.OK, {
+        "name": settings.app_name,
+        "db_echo": settings.db_echo,
+        "db_pool": db.pool_status(),
+        "llm_limiter": llm_limiter.snapshot(),
+        "response_cache": response_cache.stats(),
+        "media": retention.snapshot(),
+        "startup_ms": startup_ms,
+    })
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return metrics.render()
+
+
+@app.get("/debug/loop")
+def get_loop_stats():
+    return resp(Status.OK, loop_monitor.snapshot())
 
 
 @app.get("/")
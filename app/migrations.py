@@ -0,0 +1,203 @@
+"""
+Версионированные миграции схемы БД.
+
+Применённая версия хранится в таблице `schema_version`; при старте приложения
+проверяется только она, схема целиком не сравнивается.
+
+    python -m app.migrations          # применить недостающие миграции
+    python -m app.migrations --check  # код выхода 1, если схема отстаёт
+"""
+import argparse
+import asyncio
+from typing import Callable
+
+from sqlalchemy import (
+    JSON, Boolean, Column, Connection, Date, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, Text,
+    UniqueConstraint, func, inspect, text,
+)
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.api.v1.incidents import orm as _incidents  # noqa: F401 — rebuild_rollups работает через ORM-модели
+from app.api.v1.events import orm as _events  # noqa: F401
+from app.api.v1.timelines import orm as _timelines  # noqa: F401
+from app.api.v1.logs import orm as _logs  # noqa: F401
+
+VERSION_TABLE = "schema_version"
+
+# Схема каждой миграции зафиксирована здесь, а не берётся из текущих моделей:
+# изменение модели без новой миграции не должно молча попадать в новые БД.
+_baseline_tables = MetaData()
+Table(
+    "incidents", _baseline_tables,
+    Column("iid", Integer, primary_key=True),
+    Column("video_link", String(512), nullable=False),
+    Column("status", String(50), nullable=False),
+    Column("inferred_domain", String(50), nullable=False),
+    Column("has_event", Boolean, nullable=False),
+    Column("duration_sec", Float, nullable=False),
+    Column("num_frames", Integer, nullable=False),
+    Column("num_windows", Integer, nullable=False),
+    Column("model_version", String(50), nullable=False),
+    Column("prompt_version", String(50), nullable=False),
+    Column("analysis_json", Text, nullable=True),
+    Column("created_at", DateTime, server_default=func.now(), nullable=False),
+)
+Table(
+    "events", _baseline_tables,
+    Column("iid", Integer, primary_key=True),
+    Column("incident_iid", Integer, ForeignKey("incidents.iid"), nullable=False),
+    Column("event_type", String(50), nullable=False),
+    Column("start_time", Float, nullable=False),
+    Column("end_time", Float, nullable=False),
+    Column("confidence", Float, nullable=False),
+    Column("description", String(512), nullable=False),
+    Column("highlight", String(255), nullable=False),
+)
+Table(
+    "timelines", _baseline_tables,
+    Column("iid", Integer, primary_key=True),
+    Column("incident_iid", Integer, ForeignKey("incidents.iid"), nullable=False),
+    Column("window_idx", Integer, nullable=False),
+    Column("timestamp_sec", Float, nullable=False),
+    Column("interval_end_sec", Float, nullable=True),
+    Column("label", String(50), nullable=False),
+    Column("has_event", Boolean, nullable=False),
+    Column("caption", String(512), nullable=False),
+    Column("risk_score", Float, nullable=False),
+    Column("event_type", String(50), nullable=False),
+)
+Table(
+    "logs", _baseline_tables,
+    Column("iid", Integer, primary_key=True),
+    Column("incident_iid", Integer, ForeignKey("incidents.iid"), nullable=False),
+    Column("timedate", DateTime, server_default=func.now(), nullable=False),
+    Column("event", String(50), nullable=False),
+    Column("model_version", String(50), nullable=False),
+    Column("prompt_version", String(50), nullable=False),
+    Column("duration_sec", Float, nullable=True),
+)
+
+_rollup_tables = MetaData()
+Table(
+    "rollup_daily", _rollup_tables,
+    Column("iid", Integer, primary_key=True),
+    Column("day", Date, nullable=False),
+    Column("domain", String(50), nullable=False),
+    Column("incidents", Integer, nullable=False),
+    Column("incidents_with_events", Integer, nullable=False),
+    Column("events", Integer, nullable=False),
+    Column("windows", Integer, nullable=False),
+    Column("risk_sum", Float, nullable=False),
+    Column("processed", Integer, nullable=False),
+    Column("processing_sec_sum", Float, nullable=False),
+    UniqueConstraint("day", "domain"),
+)
+Table(
+    "rollup_daily_event_types", _rollup_tables,
+    Column("iid", Integer, primary_key=True),
+    Column("day", Date, nullable=False),
+    Column("domain", String(50), nullable=False),
+    Column("event_type", String(50), nullable=False),
+    Column("events", Integer, nullable=False),
+    UniqueConstraint("day", "domain", "event_type"),
+)
+
+
+def add_missing_columns(conn: Connection, table_name: str, *columns: Column) -> None:
+    """
+    Добавляет в существующую таблицу колонки, которых в ней ещё нет.
+    """
+    existing = {c["name"] for c in inspect(conn).get_columns(table_name)}
+    for column in columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}"))
+
+
+def _baseline(conn: Connection) -> None:
+    _baseline_tables.create_all(conn)
+    # базы, созданные до появления миграций, могли не получить эту колонку
+    add_missing_columns(conn, "logs", Column("duration_sec", Float))
+
+
+def _rollups(conn: Connection) -> None:
+    from app.api.v1.stats.crud import rebuild_rollups
+
+    add_missing_columns(conn, "incidents", Column("processing_sec", Float))
+    _rollup_tables.create_all(conn)
+    rebuild_rollups(conn)
+
+
+def _media_tier(conn: Connection) -> None:
+    add_missing_columns(conn, "incidents", Column("media_tier", String(20)))
+    conn.execute(text("UPDATE incidents SET media_tier = 'hot' WHERE media_tier IS NULL"))
+
+
+def _domain_scores(conn: Connection) -> None:
+    add_missing_columns(conn, "timelines", Column("domain_scores", JSON))
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline", _baseline),
+    (2, "rollups", _rollups),
+    (3, "media_tier", _media_tier),
+    (4, "timeline_domain_scores", _domain_scores),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn: Connection) -> int:
+    if not inspect(conn).has_table(VERSION_TABLE):
+        return 0
+    return conn.execute(text(f"SELECT MAX(version) FROM {VERSION_TABLE}")).scalar() or 0
+
+
+def upgrade(conn: Connection) -> list[str]:
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (version INTEGER NOT NULL)"))
+    version = current_version(conn)
+    applied = []
+    for number, name, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        migrate(conn)
+        conn.execute(text(f"INSERT INTO {VERSION_TABLE} (version) VALUES (:v)"), {"v": number})
+        applied.append(f"{number:04d}_{name}")
+    return applied
+
+
+async def schema_version(engine: AsyncEngine) -> int:
+    async with engine.connect() as conn:
+        return await conn.run_sync(current_version)
+
+
+async def migrate(engine: AsyncEngine) -> list[str]:
+    async with engine.begin() as conn:
+        return await conn.run_sync(upgrade)
+
+
+def main() -> None:
+    from app.database import db
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="только проверить версию схемы")
+    args = parser.parse_args()
+
+    async def run() -> int:
+        try:
+            version = await schema_version(db.engine)
+            if args.check:
+                print(f"schema version {version}, latest {LATEST_VERSION}")
+                return 0 if version >= LATEST_VERSION else 1
+            applied = await migrate(db.engine) if version < LATEST_VERSION else []
+            print("applied: " + ", ".join(applied) if applied else f"schema is current (version {version})")
+            return 0
+        finally:
+            await db.engine.dispose()
+
+    raise SystemExit(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
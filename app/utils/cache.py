@@ -0,0 +1,85 @@
+"""
+In-process кэш сериализованных ответов для завершённых инцидентов (ETag / 304)
+"""
+import hashlib
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+from app.config import settings
+from app.utils.structures import json_response
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*"
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "incident_iid")
+
+    def __init__(self, body: bytes, incident_iid: int):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.incident_iid = incident_iid
+
+    def to_response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": settings.response_cache_control}
+        if etag_matches(request, self.etag):
+            return Response(status_code=304, headers=headers)
+        return json_response(self.body, headers=headers)
+
+
+class ResponseCache:
+    """LRU по числу записей и суммарному размеру тел ответов."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+
+    def get(self, key: str) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, incident_iid: int, body: bytes) -> CachedResponse:
+        entry = CachedResponse(body, incident_iid)
+        if len(body) > self.max_bytes:
+            return entry
+        self._remove(key)
+        self._entries[key] = entry
+        self.size_bytes += len(body)
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+        return entry
+
+    def invalidate_incident(self, incident_iid: int) -> None:
+        for key in [k for k, e in self._entries.items() if e.incident_iid == incident_iid]:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= len(entry.body)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+response_cache = ResponseCache(
+    max_entries=settings.response_cache_max_entries,
+    max_bytes=settings.response_cache_max_bytes,
+)
@@ -0,0 +1,127 @@
+"""
+Мониторинг задержки цикла событий и поиск блокирующих вызовов
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+
+from app.config import settings
+from app.utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+loop_lag_seconds = Histogram(
+    "sigma_event_loop_lag_seconds",
+    "Задержка пробуждения цикла событий относительно расписания",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+class LoopMonitor:
+    """
+    Сэмплер: каждые `interval` секунд засыпает и меряет, насколько позже запланированного
+    проснулся. Задержка больше `threshold` означает, что какой-то колбэк держал цикл.
+
+    В отладочном режиме сторожевой поток следит за «пульсом» сэмплера и, если цикл
+    не отвечает дольше `threshold`, снимает стек потока цикла — это и есть блокирующий вызов.
+    """
+
+    def __init__(self, interval: float, threshold: float, debug: bool = False, max_reports: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.debug = debug
+        self.samples: deque[float] = deque(maxlen=1000)
+        self.stalls: deque[dict] = deque(maxlen=max_reports)
+        self.max_lag = 0.0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._pending_stack: list[str] | None = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample())
+        if self.debug:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _sample(self) -> None:
+        while True:
+            scheduled = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - scheduled)
+            self._heartbeat = now
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            loop_lag_seconds.observe(lag)
+            if lag >= self.threshold:
+                self._report_stall(lag)
+
+    def _report_stall(self, lag: float) -> None:
+        stack, self._pending_stack = self._pending_stack, None
+        self.stalls.append({
+            "at": datetime.now(timezone.utc).isoformat(),
+            "blocked_ms": round(lag * 1000, 1),
+            "stack": stack,
+        })
+        if stack:
+            logger.warning("event loop blocked for %.0f ms in:\n%s", lag * 1000, "".join(stack))
+        else:
+            logger.warning("event loop blocked for %.0f ms", lag * 1000)
+
+    def _watch(self) -> None:
+        captured_for = None
+        while not self._stop.wait(self.threshold / 4):
+            heartbeat = self._heartbeat
+            if time.monotonic() - heartbeat < self.interval + self.threshold or captured_for == heartbeat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._pending_stack = traceback.format_stack(frame)
+                captured_for = heartbeat
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+
+        def pct(q: float) -> float:
+            return round(ordered[int((len(ordered) - 1) * q)] * 1000, 2) if ordered else 0.0
+
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "debug": self.debug,
+            "lag_ms": {
+                "last": round(self.samples[-1] * 1000, 2) if self.samples else 0.0,
+                "p50": pct(0.5),
+                "p99": pct(0.99),
+                "max": round(self.max_lag * 1000, 2),
+            },
+            "stalls": list(self.stalls),
+        }
+
+
+loop_monitor = LoopMonitor(
+    interval=settings.loop_monitor_interval_ms / 1000,
+    threshold=settings.loop_lag_threshold_ms / 1000,
+    debug=settings.loop_monitor_debug,
+    max_reports=settings.loop_monitor_max_reports,
+)
@@ -0,0 +1,78 @@
+"""
+Single-flight: одновременные одинаковые вызовы разделяют один запрос и его результат
+"""
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from app.utils.metrics import Counter
+
+T = TypeVar("T")
+
+coalesced_calls_total = Counter(
+    "sigma_singleflight_coalesced_total",
+    "Вызовы, присоединившиеся к уже выполняющемуся одинаковому запросу",
+    labels=("name",),
+)
+
+
+def digest(*parts: str | bytes) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode() if isinstance(part, str) else part)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def file_digest(path, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Первый вызов с ключом запускает `fn` отдельной задачей, остальные ждут её же.
+    Отмена одного ожидающего не трогает остальных; задача отменяется, когда ждать её больше некому.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, _Call] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda task: self._forget(key, call))
+            self._calls[key] = call
+        else:
+            coalesced_calls_total.inc(name=self.name)
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+                self._forget(key, call)
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if call.task.done() and not call.task.cancelled():
+            call.task.exception()
+
+    def inflight(self) -> int:
+        return len(self._calls)
@@ -3,6 +3,10 @@ GreenSkills 2026
 
 Файл для хранения структур ответа
 """
+from typing import Any, Iterable, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse, Response
 
 
 class Status:
@@ -18,3 +22,27 @@ def resp(status: Status = "OK", data: dict | list | str = {}) -> dict:
         return {"status": status, "data": data}
     else:
         return {"status": status, "message": data}
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    Ответ, сериализуемый через orjson
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def resp_rows(keys: Sequence[str], rows: Iterable[Sequence]) -> bytes:
+    """
+    Конверт `resp(Status.OK, [...])` сразу в байты из кортежей строк — без pydantic-моделей
+    """
+    return dumps({"status": Status.OK, "data": [dict(zip(keys, row)) for row in rows]})
+
+
+def json_response(body: bytes, **kwargs) -> Response:
+    return Response(content=body, media_type="application/json", **kwargs)
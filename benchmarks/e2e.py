@@ -0,0 +1,191 @@
+"""
+Сквозной бенчмарк: заглушка LLM + настоящее FastAPI-приложение.
+
+Синтезирует видео, загружает их через `POST /incidents/upload` с заданной
+параллельностью, ждёт завершения по SSE и забирает результат
+(`GET /incidents/{id}`, `/events`, `/timelines`). Печатает и сохраняет в JSON
+пропускную способность, p50/p99 сквозной задержки, пиковый RSS и задержку
+цикла событий приложения.
+
+    python -m benchmarks.e2e --videos 20 --concurrency 4 --latency-ms 300 --output bench.json
+    python -m benchmarks.e2e --videos 20 --concurrency 4 --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.server import LoopLagSampler, ThreadedServer, peak_rss_mb, percentile
+from benchmarks.stub_llm import create_stub_app
+from benchmarks.videos import synthesize_video
+
+COMPARED_METRICS = (
+    "throughput_per_min", "latency_p50_sec", "latency_p99_sec", "peak_rss_mb", "loop_lag_p99_ms", "llm_upload_mb",
+)
+
+
+async def _run_incident(client: httpx.AsyncClient, video: Path, domain: str | None) -> dict:
+    started = time.perf_counter()
+    with open(video, "rb") as f:
+        data = {"domain": domain} if domain else {}
+        r = await client.post("/api/v1/incidents/upload", files={"file": (video.name, f, "video/mp4")}, data=data)
+    r.raise_for_status()
+    incident_iid = r.json()["data"]["incident_iid"]
+    uploaded = time.perf_counter()
+
+    final_status = None
+    async with client.stream("GET", f"/api/v1/incidents/{incident_iid}/status/stream") as stream:
+        async for line in stream.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            message = json.loads(line[6:])
+            final_status = message.get("status", final_status)
+            if message.get("event") == "close":
+                break
+    processed = time.perf_counter()
+
+    await client.get(f"/api/v1/incidents/{incident_iid}")
+    await client.get("/api/v1/events/", params={"incident_iid": incident_iid, "limit": 200})
+    await client.get("/api/v1/timelines/", params={"incident_iid": incident_iid, "limit": 500})
+    finished = time.perf_counter()
+
+    return {
+        "incident_iid": incident_iid,
+        "status": final_status,
+        "upload_sec": uploaded - started,
+        "processing_sec": processed - uploaded,
+        "fetch_sec": finished - processed,
+        "total_sec": finished - started,
+    }
+
+
+async def _drive(base_url: str, videos: list[Path], concurrency: int, domain: str | None) -> list[dict]:
+    sem = asyncio.Semaphore(concurrency)
+    timeout = httpx.Timeout(connect=10.0, read=900.0, write=60.0, pool=60.0)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        async def one(video: Path) -> dict:
+            async with sem:
+                return await _run_incident(client, video, domain)
+
+        return await asyncio.gather(*(one(v) for v in videos))
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _compare(current: dict, baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text())["summary"]
+    print(f"\nСравнение с {baseline_path}:")
+    for key in COMPARED_METRICS:
+        old, new = baseline.get(key), current.get(key)
+        if not old or new is None:
+            continue
+        print(f"  {key:22s} {old:12.3f} → {new:12.3f} ({(new - old) / old * 100:+.1f}%)")
+
+
+def run(args: argparse.Namespace) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix="sigma-bench-"))
+    stub_app = create_stub_app(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        failure_rate=args.failure_rate,
+        event_rate=args.event_rate,
+        seed=args.seed,
+    )
+    stub = ThreadedServer(stub_app).start()
+
+    os.environ.update({
+        "DB_URL": args.db_url or f"sqlite+aiosqlite:///{workdir}/bench.db",
+        "LLM_API_URL": stub.url,
+        "MEDIA_DIR": str(workdir / "media"),
+        "MEDIA_COLD_DIR": str(workdir / "media" / "cold"),
+        "INGEST_DIR": str(workdir / "ingest"),
+    })
+    from app.main import app
+
+    api = ThreadedServer(app).start()
+    lag = LoopLagSampler()
+    lag.attach(api.loop)
+
+    videos = [
+        synthesize_video(workdir / f"bench_{i}.mp4", duration_sec=args.duration, fps=args.fps, seed=args.seed + i)
+        for i in range(args.videos)
+    ]
+
+    started = time.perf_counter()
+    results = asyncio.run(_drive(api.url, videos, args.concurrency, args.domain))
+    wall = time.perf_counter() - started
+
+    lag.stop()
+    api.stop()
+    stub.stop()
+
+    totals = [r["total_sec"] for r in results]
+    summary = {
+        "videos": len(results),
+        "wall_sec": round(wall, 3),
+        "throughput_per_min": round(len(results) / wall * 60, 3),
+        "latency_p50_sec": round(percentile(totals, 50), 3),
+        "latency_p99_sec": round(percentile(totals, 99), 3),
+        "upload_p50_sec": round(percentile([r["upload_sec"] for r in results], 50), 3),
+        "processing_p50_sec": round(percentile([r["processing_sec"] for r in results], 50), 3),
+        "fetch_p50_sec": round(percentile([r["fetch_sec"] for r in results], 50), 3),
+        "statuses": {s: sum(r["status"] == s for r in results) for s in {r["status"] for r in results}},
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "loop_lag_p50_ms": round(percentile(lag.samples, 50) * 1000, 2),
+        "loop_lag_p99_ms": round(percentile(lag.samples, 99) * 1000, 2),
+        "loop_lag_max_ms": round(max(lag.samples, default=0.0) * 1000, 2),
+        "llm_calls": dict(stub_app.state.calls),
+        "llm_upload_mb": round(sum(stub_app.state.received_bytes.values()) / 1024 / 1024, 2),
+    }
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "environment": {
+            "git_revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+        },
+        "summary": summary,
+        "incidents": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0, help="длительность синтетического видео, с")
+    parser.add_argument("--fps", type=int, default=25)
+    parser.add_argument("--domain", default=None)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="задержка заглушки LLM")
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="доля ответов 5xx от заглушки")
+    parser.add_argument("--event-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db-url", default=None, help="по умолчанию — временная SQLite")
+    parser.add_argument("--output", type=Path, default=None, help="куда сохранить JSON с результатами")
+    parser.add_argument("--baseline", type=Path, default=None, help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report["summary"], indent=2, ensure_ascii=False))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.baseline:
+        _compare(report["summary"], args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Оценка CPU-префильтра против полного прогона VLM.
+
+Каждое видео проходит покадровый анализ в режиме `shadow` (в VLM уходят все окна), после чего
+для сетки порогов считаются доля пропускаемых окон и полнота по окнам с событием.
+Без `--llm-url` используется локальная заглушка — её ответы случайны, так что полнота
+в этом случае проверяет только механику; для настоящей оценки укажите адрес VLM.
+
+    python -m benchmarks.prefilter --prefilter motion --videos a.mp4 b.mp4 --llm-url http://vlm:9011
+    python -m benchmarks.prefilter --prefilter flow --thresholds 0.002 0.005 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+DEFAULT_THRESHOLDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05)
+
+
+def _synthesize(workdir: Path) -> list[Path]:
+    import cv2
+    import numpy as np
+
+    from benchmarks.videos import synthesize_video
+
+    static = workdir / "static.mp4"
+    writer = cv2.VideoWriter(str(static), cv2.VideoWriter_fourcc(*"mp4v"), 25, (640, 360))
+    rng = np.random.default_rng(0)
+    background = np.full((360, 640, 3), 80, dtype=np.uint8)
+    for _ in range(250):
+        writer.write(np.clip(background + rng.normal(0, 4, background.shape), 0, 255).astype(np.uint8))
+    writer.release()
+    return [synthesize_video(workdir / "moving.mp4", duration_sec=10.0, seed=1), static]
+
+
+def _sweep(timelines: list[list[dict]], thresholds: list[float]) -> list[dict]:
+    from app.api.v1.services.prefilter import is_positive
+
+    windows = [w for timeline in timelines for w in timeline if "prefilter_score" in w]
+    positives = [w for w in windows if is_positive(w)]
+    rows = []
+    for threshold in thresholds:
+        skipped = sum(w["prefilter_score"] < threshold for w in windows)
+        missed = sum(w["prefilter_score"] < threshold for w in positives)
+        rows.append({
+            "threshold": threshold,
+            "skip_rate": round(skipped / len(windows), 4) if windows else None,
+            "recall": round(1 - missed / len(positives), 4) if positives else None,
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prefilter", choices=("motion", "flow", "dnn"), default="motion")
+    parser.add_argument("--videos", type=Path, nargs="*", default=None)
+    parser.add_argument("--domain", default="traffic")
+    parser.add_argument("--llm-url", default=None, help="адрес VLM; по умолчанию локальная заглушка")
+    parser.add_argument("--thresholds", type=float, nargs="*", default=list(DEFAULT_THRESHOLDS))
+    parser.add_argument("--output", type=Path, default=None, help="куда сохранить JSON с результатами")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="sigma-prefilter-"))
+    os.environ.update({
+        "PREFILTER": args.prefilter,
+        "PREFILTER_MODE": "shadow",
+        "MEDIA_DIR": str(workdir / "media"),
+        "MEDIA_COLD_DIR": str(workdir / "media" / "cold"),
+        "INGEST_DIR": str(workdir / "ingest"),
+    })
+    stub = None
+    if args.llm_url is None:
+        from benchmarks.server import ThreadedServer
+        from benchmarks.stub_llm import create_stub_app
+
+        stub = ThreadedServer(create_stub_app(latency_ms=5, jitter_ms=0, failure_rate=0.0, event_rate=0.2, seed=0)).start()
+        args.llm_url = stub.url
+    os.environ["LLM_API_URL"] = args.llm_url
+
+    from app.config import settings
+    from app.api.v1.services.frame_analyzer import analyze_video_by_frames
+
+    videos = args.videos or _synthesize(workdir)
+    timelines = []
+    started = time.perf_counter()
+    for video in videos:
+        result = asyncio.run(analyze_video_by_frames(
+            video, domain=args.domain, window_sec=settings.llm_window_sec, frames_per_window=settings.llm_frames_per_window,
+        ))
+        timelines.append(result["timeline"])
+    if stub is not None:
+        stub.stop()
+
+    report = {
+        "prefilter": args.prefilter,
+        "videos": len(videos),
+        "windows": sum(len(t) for t in timelines),
+        "wall_sec": round(time.perf_counter() - started, 2),
+        "sweep": _sweep(timelines, args.thresholds),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Микро-бенчмарк сериализации списков: pydantic + jsonable_encoder против кортежей строк + orjson.
+
+`encode` — только сериализация N строк таймлайна в памяти, оба пути в одном прогоне.
+`http` — пропускная способность `GET /timelines/?incident_iid=&limit=` настоящего приложения
+на временной SQLite; «до/после» сравнивается прогоном на разных ревизиях через --output/--baseline.
+
+    python -m benchmarks.serialization encode --rows 500
+    python -m benchmarks.serialization http --rows 500 --seconds 10 --concurrency 8 --output ser.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.server import ThreadedServer, percentile
+
+COMPARED_METRICS = ("requests_per_sec", "latency_p50_ms", "latency_p99_ms", "response_bytes")
+
+
+def _timeline_values(rows: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "iid": i + 1,
+            "incident_iid": 1,
+            "window_idx": i,
+            "timestamp_sec": i * 1.5,
+            "interval_end_sec": (i + 1) * 1.5,
+            "label": rng.choice(("SAFE", "EVENT")),
+            "has_event": rng.random() < 0.1,
+            "caption": "На перекрёстке движутся автомобили, пешеходы ожидают сигнала светофора" * rng.randint(1, 3),
+            "risk_score": round(rng.random(), 3),
+            "event_type": "",
+        }
+        for i in range(rows)
+    ]
+
+
+def _bench(fn, repeat: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def run_encode(args: argparse.Namespace) -> dict:
+    from fastapi.encoders import jsonable_encoder
+
+    from app.api.v1.timelines.orm import Timeline
+    from app.api.v1.timelines.schemas import Timeline as TimelineSchema
+    from app.utils.structures import Status, resp, resp_rows
+
+    values = _timeline_values(args.rows, args.seed)
+    objects = [Timeline(**v) for v in values]
+    keys = [c.name for c in Timeline.__table__.columns]
+    rows = [tuple(v[k] for k in keys) for v in values]
+
+    def legacy() -> bytes:
+        payload = resp(Status.OK, [TimelineSchema.model_validate(t).model_dump() for t in objects])
+        return json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode()
+
+    def direct() -> bytes:
+        return resp_rows(keys, rows)
+
+    legacy_sec = _bench(legacy, args.repeat)
+    direct_sec = _bench(direct, args.repeat)
+    return {
+        "rows": args.rows,
+        "legacy_ms": round(legacy_sec * 1000, 3),
+        "orjson_rows_ms": round(direct_sec * 1000, 3),
+        "speedup": round(legacy_sec / direct_sec, 1),
+        "legacy_bytes": len(legacy()),
+        "orjson_rows_bytes": len(direct()),
+    }
+
+
+async def _seed(rows: int, seed: int) -> int:
+    from app.api.v1.incidents.orm import Incident
+    from app.api.v1.timelines.orm import Timeline
+    from app.database import db
+
+    async with db.session_factory() as session:
+        incident = Incident(video_link="bench", status="PROCESSING")
+        session.add(incident)
+        await session.flush()
+        for v in _timeline_values(rows, seed):
+            v.pop("iid")
+            session.add(Timeline(**{**v, "incident_iid": incident.iid}))
+        await session.commit()
+        return incident.iid
+
+
+async def _hammer(base_url: str, path: str, seconds: float, concurrency: int) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    size = 0
+    deadline = time.perf_counter() + seconds
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        async def worker():
+            nonlocal size
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                r = await client.get(path)
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+                size = len(r.content)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, size
+
+
+def run_http(args: argparse.Namespace) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix="sigma-ser-"))
+    os.environ.update({
+        "DB_URL": f"sqlite+aiosqlite:///{workdir}/bench.db",
+        "MEDIA_DIR": str(workdir / "media"),
+        "MEDIA_COLD_DIR": str(workdir / "media" / "cold"),
+        "INGEST_DIR": str(workdir / "ingest"),
+    })
+    from app.main import app
+
+    api = ThreadedServer(app).start()
+    incident_iid = asyncio.run_coroutine_threadsafe(_seed(args.rows, args.seed), api.loop).result()
+    path = f"/api/v1/timelines/?incident_iid={incident_iid}&limit={args.rows}"
+
+    started = time.perf_counter()
+    latencies, size = asyncio.run(_hammer(api.url, path, args.seconds, args.concurrency))
+    wall = time.perf_counter() - started
+    api.stop()
+
+    return {
+        "rows": args.rows,
+        "concurrency": args.concurrency,
+        "requests": len(latencies),
+        "requests_per_sec": round(len(latencies) / wall, 1),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "response_bytes": size,
+    }
+
+
+def _compare(current: dict, baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\nСравнение с {baseline_path}:")
+    for key in COMPARED_METRICS:
+        old, new = baseline.get(key), current.get(key)
+        if not old or new is None:
+            continue
+        print(f"  {key:18s} {old:12.2f} → {new:12.2f} ({(new - old) / old * 100:+.1f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=("encode", "http"))
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200, help="повторов сериализации (encode)")
+    parser.add_argument("--seconds", type=float, default=10.0, help="длительность нагрузки (http)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None, help="куда сохранить JSON с результатами")
+    parser.add_argument("--baseline", type=Path, default=None, help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    report = run_encode(args) if args.mode == "encode" else run_http(args)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.baseline:
+        _compare(report, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Бенчмарк сводной аналитики: чтение дневных агрегатов против GROUP BY по `timelines`/`events`.
+
+Таблицы наполняются синтетическими инцидентами ступенями по `--step`, на каждой ступени
+замеряется латентность `GET /stats/` и «наивного» агрегирующего запроса по сырым строкам.
+Первое должно оставаться постоянным, второе — расти вместе с объёмом.
+
+    python -m benchmarks.stats --steps 5 --step 200 --windows 200
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import func, insert, select
+
+from benchmarks.server import percentile
+
+DOMAINS = ("traffic", "violence", "fire")
+EVENT_TYPES = ("collision", "fight", "smoke")
+
+
+async def _seed(count: int, windows: int, rng: random.Random) -> None:
+    from app.api.v1.events.orm import Event
+    from app.api.v1.incidents.orm import Incident
+    from app.api.v1.stats.crud import apply_incident_rollup
+    from app.api.v1.timelines.orm import Timeline
+    from app.database import db
+
+    async with db.session_factory() as session:
+        for _ in range(count):
+            timeline = [
+                {"window_idx": i, "timestamp_sec": i * 1.5, "interval_end_sec": (i + 1) * 1.5,
+                 "risk_score": round(rng.random(), 3), "has_event": False, "label": "SAFE", "caption": ""}
+                for i in range(windows)
+            ]
+            events = [
+                {"event_type": rng.choice(EVENT_TYPES), "start_time": i * 10.0, "end_time": i * 10.0 + 3}
+                for i in range(rng.randint(0, 5))
+            ]
+            incident = Incident(
+                video_link="bench", status="DONE", inferred_domain=rng.choice(DOMAINS),
+                processing_sec=round(rng.uniform(5, 60), 2),
+                analysis_json=json.dumps({"timeline": timeline, "events": events, "has_event": bool(events)}),
+            )
+            session.add(incident)
+            await session.flush()
+            await session.execute(insert(Timeline), [{**w, "incident_iid": incident.iid} for w in timeline])
+            if events:
+                await session.execute(insert(Event), [{**e, "incident_iid": incident.iid} for e in events])
+            await apply_incident_rollup(session, incident)
+        await session.commit()
+
+
+async def _naive() -> None:
+    from app.api.v1.events.orm import Event
+    from app.api.v1.incidents.orm import Incident
+    from app.api.v1.timelines.orm import Timeline
+    from app.database import db
+
+    day = func.date(Incident.created_at)
+    async with db.session_factory() as session:
+        await session.execute(
+            select(day, Incident.inferred_domain, func.count(func.distinct(Incident.iid)), func.avg(Timeline.risk_score))
+            .join(Timeline, Timeline.incident_iid == Incident.iid)
+            .group_by(day, Incident.inferred_domain)
+        )
+        await session.execute(
+            select(day, Incident.inferred_domain, Event.event_type, func.count(Event.iid))
+            .join(Event, Event.incident_iid == Incident.iid)
+            .group_by(day, Incident.inferred_domain, Event.event_type)
+        )
+
+
+def _measure(fn, repeat: int) -> list[float]:
+    fn()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--step", type=int, default=200, help="инцидентов на ступень")
+    parser.add_argument("--windows", type=int, default=200, help="окон таймлайна на инцидент")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None, help="куда сохранить JSON с результатами")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="sigma-stats-"))
+    os.environ.update({
+        "DB_URL": f"sqlite+aiosqlite:///{workdir}/bench.db",
+        "MEDIA_DIR": str(workdir / "media"),
+        "MEDIA_COLD_DIR": str(workdir / "media" / "cold"),
+        "INGEST_DIR": str(workdir / "ingest"),
+    })
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    report = []
+    with TestClient(app) as client:
+        def stats():
+            client.get("/api/v1/stats/").raise_for_status()
+
+        for step in range(1, args.steps + 1):
+            client.portal.call(_seed, args.step, args.windows, rng)
+            rollup = _measure(stats, args.repeat)
+            naive = _measure(lambda: client.portal.call(_naive), args.repeat)
+            row = {
+                "incidents": step * args.step,
+                "timeline_rows": step * args.step * args.windows,
+                "stats_p50_ms": round(percentile(rollup, 50) * 1000, 2),
+                "naive_p50_ms": round(percentile(naive, 50) * 1000, 2),
+            }
+            report.append(row)
+            print(json.dumps(row, ensure_ascii=False))
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Локальная заглушка LLM-сервиса: `/generate`, `/analyze_video`, `/generate_report_from_json`
+с настраиваемой задержкой и долей ошибок.
+
+    python -m benchmarks.stub_llm --port 9011 --latency-ms 300 --failure-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from fastapi import FastAPI, Request, Response
+
+
+def create_stub_app(
+    latency_ms: float = 200.0,
+    jitter_ms: float = 50.0,
+    failure_rate: float = 0.0,
+    event_rate: float = 0.1,
+    seed: int | None = None,
+) -> FastAPI:
+    rng = random.Random(seed)
+    app = FastAPI(title="Sigma LLM stub")
+    app.state.calls = {"/generate": 0, "/analyze_video": 0, "/generate_report_from_json": 0}
+    app.state.received_bytes = {"/generate": 0, "/analyze_video": 0, "/generate_report_from_json": 0}
+
+    async def _simulate(endpoint: str, scale: float = 1.0) -> Response | None:
+        app.state.calls[endpoint] += 1
+        delay = max(0.0, rng.gauss(latency_ms, jitter_ms)) * scale / 1000
+        await asyncio.sleep(delay)
+        if rng.random() < failure_rate:
+            return Response(status_code=rng.choice([500, 502, 503]))
+        return None
+
+    @app.post("/generate")
+    async def generate(request: Request):
+        app.state.received_bytes["/generate"] += len(await request.body())
+        failed = await _simulate("/generate")
+        if failed is not None:
+            return failed
+        has_event = rng.random() < event_rate
+        risk_score = round(rng.uniform(0.6, 1.0) if has_event else rng.uniform(0.0, 0.3), 2)
+        # оценки по доменам для мультидоменного промпта: у случайного домена — risk_score, у остальных меньше
+        domains = ("traffic", "production", "violence")
+        top = rng.choice(domains)
+        return {"text": json.dumps({
+            "has_event": has_event,
+            "description": "stub: событие" if has_event else "stub: спокойная сцена",
+            "risk_score": risk_score,
+            "scores": {d: risk_score if d == top else round(rng.uniform(0.0, 0.2), 2) for d in domains},
+        }, ensure_ascii=False)}
+
+    @app.post("/analyze_video")
+    async def analyze_video(request: Request):
+        app.state.received_bytes["/analyze_video"] += len(await request.body())
+        window_sec = float(request.query_params.get("window_sec", 1.5))
+        failed = await _simulate("/analyze_video", scale=5.0)
+        if failed is not None:
+            return failed
+        num_windows = 10
+        timeline = []
+        events = []
+        for idx in range(num_windows):
+            start, end = round(idx * window_sec, 2), round((idx + 1) * window_sec, 2)
+            has_event = rng.random() < event_rate
+            timeline.append({
+                "window_idx": idx,
+                "timestamp_sec": start,
+                "interval_end_sec": end,
+                "label": "EVENT" if has_event else "SAFE",
+                "has_event": has_event,
+                "caption": "stub",
+                "risk_score": 0.9 if has_event else 0.1,
+                "event_type": "stub" if has_event else "safe",
+            })
+            if has_event:
+                events.append({
+                    "event_type": "stub",
+                    "interval_start_sec": start,
+                    "interval_end_sec": end,
+                    "description": "stub",
+                    "highlight_start_sec": start,
+                    "highlight_end_sec": end,
+                })
+        return {
+            "status": "completed",
+            "inferred_domain": request.query_params.get("domain", "other"),
+            "has_event": bool(events),
+            "events": events,
+            "timeline": timeline,
+            "metadata": {"duration_sec": num_windows * window_sec, "num_frames": 0, "num_windows": num_windows},
+        }
+
+    @app.post("/generate_report_from_json")
+    async def generate_report(request: Request):
+        body = await request.body()
+        app.state.received_bytes["/generate_report_from_json"] += len(body)
+        failed = await _simulate("/generate_report_from_json", scale=2.0)
+        if failed is not None:
+            return failed
+        return Response(content=b"PK\x03\x04stub-report" + str(len(body)).encode(), media_type="application/octet-stream")
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9011)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--event-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_stub_app(args.latency_ms, args.jitter_ms, args.failure_rate, args.event_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
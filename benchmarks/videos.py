@@ -0,0 +1,41 @@
+"""
+Синтетические тестовые видео для бенчмарков (OpenCV, без внешних файлов)
+"""
+import random
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+def synthesize_video(
+    path: Path,
+    duration_sec: float = 10.0,
+    fps: int = 25,
+    size: tuple[int, int] = (640, 360),
+    seed: int = 0,
+) -> Path:
+    rng = random.Random(seed)
+    width, height = size
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+
+    objects = [
+        {
+            "x": rng.uniform(0, width), "y": rng.uniform(0, height),
+            "vx": rng.uniform(-6, 6), "vy": rng.uniform(-4, 4),
+            "r": rng.randint(10, 40),
+            "color": tuple(rng.randint(40, 255) for _ in range(3)),
+        }
+        for _ in range(rng.randint(3, 8))
+    ]
+    background = np.full((height, width, 3), 30, dtype=np.uint8)
+    for i in range(int(duration_sec * fps)):
+        frame = background.copy()
+        for obj in objects:
+            obj["x"] = (obj["x"] + obj["vx"]) % width
+            obj["y"] = (obj["y"] + obj["vy"]) % height
+            cv2.circle(frame, (int(obj["x"]), int(obj["y"])), obj["r"], obj["color"], -1)
+        cv2.putText(frame, f"{i / fps:6.2f}s", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+    return path
@@ -0,0 +1,13 @@
+"""
+Тесты не трогают рабочую БД и `media/`: настройки указывают во временный каталог
+до первого импорта `app.config`.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+_tmp = Path(tempfile.mkdtemp(prefix="sigma-tests-"))
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{_tmp / 'sigma.db'}"
+os.environ["MEDIA_DIR"] = str(_tmp / "media")
+os.environ["INGEST_DIR"] = str(_tmp / "ingest")
+os.environ["DB_REPLICA_URLS"] = "[]"
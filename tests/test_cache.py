@@ -0,0 +1,60 @@
+from starlette.requests import Request
+
+from app.utils.cache import ResponseCache, etag_matches
+
+
+def _request(if_none_match: str | None = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_etag_matches():
+    etag = '"abc"'
+    assert etag_matches(_request('"abc"'), etag)
+    assert etag_matches(_request('"x", "abc"'), etag)
+    assert etag_matches(_request("*"), etag)
+    assert not etag_matches(_request('"x"'), etag)
+    assert not etag_matches(_request(), etag)
+
+
+def test_cached_response_returns_304_for_matching_etag():
+    entry = ResponseCache(max_entries=4, max_bytes=1024).put("k", 1, b'{"a":1}')
+    assert entry.to_response(_request()).status_code == 200
+    response = entry.to_response(_request(entry.etag))
+    assert response.status_code == 304
+    assert response.headers["etag"] == entry.etag
+
+
+def test_same_body_same_etag():
+    cache = ResponseCache(max_entries=4, max_bytes=1024)
+    assert cache.put("a", 1, b"body").etag == cache.put("b", 2, b"body").etag
+    assert cache.put("c", 3, b"other").etag != cache.get("a").etag
+
+
+def test_lru_eviction_by_entries():
+    cache = ResponseCache(max_entries=2, max_bytes=1024)
+    cache.put("a", 1, b"1")
+    cache.put("b", 2, b"2")
+    cache.get("a")
+    cache.put("c", 3, b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_eviction_by_size_and_oversized_bodies():
+    cache = ResponseCache(max_entries=10, max_bytes=10)
+    cache.put("a", 1, b"x" * 6)
+    cache.put("b", 2, b"y" * 6)
+    assert cache.get("a") is None and cache.size_bytes == 6
+    cache.put("big", 3, b"z" * 11)
+    assert cache.get("big") is None and cache.size_bytes == 6
+
+
+def test_invalidate_incident():
+    cache = ResponseCache(max_entries=10, max_bytes=1024)
+    cache.put("detail:1", 1, b"a")
+    cache.put("timeline:1", 1, b"b")
+    cache.put("detail:2", 2, b"c")
+    cache.invalidate_incident(1)
+    assert cache.stats()["entries"] == 1 and cache.size_bytes == 1
+    assert cache.get("detail:2") is not None
@@ -0,0 +1,101 @@
+import numpy as np
+
+from app.api.v1.services.consolidation import (
+    consolidate_events, consolidate_multi_domain, domain_profile, fill_gaps, hysteresis_segments, infer_domain, nms_1d,
+    segment_peaks, timeline_domains,
+)
+
+
+def _timeline(scores: list[float], window_sec: float = 2.0, **extra) -> list[dict]:
+    return [
+        {
+            "window_idx": i,
+            "timestamp_sec": i * window_sec,
+            "interval_end_sec": (i + 1) * window_sec,
+            "risk_score": score,
+            "has_event": False,
+            "caption": f"w{i}",
+            **extra,
+        }
+        for i, score in enumerate(scores)
+    ]
+
+
+def test_hysteresis_needs_one_strong_window():
+    scores = np.array([0.1, 0.5, 0.9, 0.5, 0.1, 0.5, 0.5, 0.1, 0.95])
+    first, last = hysteresis_segments(scores, low=0.4, high=0.8)
+    assert first.tolist() == [1, 8]
+    assert last.tolist() == [3, 8]
+
+
+def test_hysteresis_without_segments():
+    first, last = hysteresis_segments(np.array([0.1, 0.2]), low=0.4, high=0.8)
+    assert len(first) == 0 and len(last) == 0
+
+
+def test_fill_gaps_merges_close_segments():
+    starts = np.arange(10, dtype=float)
+    ends = starts + 1
+    first, last = fill_gaps(np.array([0, 3, 8]), np.array([1, 4, 8]), starts, ends, max_gap_sec=1.5)
+    assert first.tolist() == [0, 8]
+    assert last.tolist() == [4, 8]
+
+
+def test_segment_peaks_prefers_earliest_tie():
+    scores = np.array([0.9, 0.9, 0.9, 0.1, 0.5, 0.7, 0.7])
+    assert segment_peaks(scores, np.array([0, 4]), np.array([2, 6])).tolist() == [0, 5]
+
+
+def test_nms_keeps_strongest_of_overlapping():
+    starts = np.array([0.0, 1.0, 10.0])
+    ends = np.array([5.0, 6.0, 12.0])
+    keep = nms_1d(starts, ends, np.array([0.7, 0.9, 0.5]), iou_threshold=0.3)
+    assert keep.tolist() == [1, 2]
+    assert nms_1d(starts, ends, np.array([0.7, 0.9, 0.5]), iou_threshold=0.3, max_keep=1).tolist() == [1]
+
+
+def test_consolidate_events_one_event_per_segment():
+    timeline = _timeline([0.1, 0.5, 0.9, 0.6, 0.1, 0.1, 0.1, 0.85, 0.1])
+    events = consolidate_events(timeline, "traffic", max_events=5, low=0.4, high=0.8, max_gap_sec=0.0, iou_threshold=0.3)
+    assert [(e["interval_start_sec"], e["interval_end_sec"]) for e in events] == [(2.0, 8.0), (14.0, 16.0)]
+    assert events[0]["confidence"] == 0.9
+    assert events[0]["description"] == "w2"
+    assert (events[0]["highlight_start_sec"], events[0]["highlight_end_sec"]) == (4.0, 6.0)
+    assert all(e["event_type"] == "traffic" for e in events)
+
+
+def test_model_flag_opens_event_despite_low_score():
+    timeline = _timeline([0.1, 0.2, 0.1])
+    timeline[1]["has_event"] = True
+    events = consolidate_events(timeline, "violence", max_events=5, low=0.4, high=0.8, max_gap_sec=0.0, iou_threshold=0.3)
+    assert len(events) == 1 and events[0]["confidence"] == 0.8
+
+
+def test_consolidate_events_empty():
+    assert consolidate_events([], "traffic") == []
+    assert consolidate_events(_timeline([0.1, 0.2]), "traffic", low=0.4, high=0.8) == []
+
+
+def test_domain_profile_and_inference():
+    timeline = [
+        {"domain_scores": {"traffic": 0.9, "violence": 0.1}},
+        {"domain_scores": {"traffic": 0.8, "violence": 0.95}},
+        {"domain_scores": {"traffic": 0.7, "violence": 0.0}},
+        {"domain_scores": {"traffic": 0.1, "violence": 0.0}},
+    ]
+    domains = timeline_domains(timeline)
+    assert domains == ["traffic", "violence"]
+    profile = domain_profile(timeline, domains, top_k=3)
+    assert profile == {"traffic": 0.8, "violence": 0.35}
+    assert infer_domain(profile) == "traffic"
+    assert infer_domain({"traffic": 0.01}) == "other"
+    assert infer_domain({}) == "other"
+
+
+def test_multi_domain_events_use_per_domain_scores():
+    scores = [(0.1, 0.1), (0.9, 0.1), (0.1, 0.1), (0.1, 0.9), (0.1, 0.1)]
+    timeline = _timeline([0.0] * len(scores))
+    for window, (traffic, violence) in zip(timeline, scores):
+        window["domain_scores"] = {"traffic": traffic, "violence": violence}
+    events = consolidate_multi_domain(timeline, ["traffic", "violence"], max_events=5)
+    assert [(e["event_type"], e["interval_start_sec"]) for e in events] == [("traffic", 2.0), ("violence", 6.0)]
@@ -0,0 +1,88 @@
+import asyncio
+
+from app.api.v1.services.limiter import AdaptiveLimiter
+
+
+def _limiter(limit: int = 2, **kwargs) -> AdaptiveLimiter:
+    params = {"min_limit": 1, "max_limit": 8, "latency_tolerance": 2.0, "backoff_ratio": 0.5, **kwargs}
+    return AdaptiveLimiter(initial_limit=limit, **params)
+
+
+def test_acquire_waits_above_limit():
+    limiter = _limiter(limit=2)
+
+    async def scenario():
+        await limiter.acquire()
+        await limiter.acquire()
+        third = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not third.done() and limiter.queue_depth == 1
+        limiter.release()
+        await asyncio.wait_for(third, 1.0)
+        assert limiter.inflight == 2 and limiter.queue_depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_waiters_are_served_round_robin_per_key():
+    limiter = _limiter(limit=1)
+    served = []
+
+    async def job(key, name):
+        await limiter.acquire(key)
+        served.append(name)
+
+    async def scenario():
+        await limiter.acquire()
+        tasks = [asyncio.create_task(job("a", f"a{i}")) for i in range(3)]
+        tasks.append(asyncio.create_task(job("b", "b0")))
+        await asyncio.sleep(0)
+        for _ in tasks:
+            limiter.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert served == ["a0", "b0", "a1", "a2"]
+
+
+def test_cancelled_waiter_leaves_queue():
+    limiter = _limiter(limit=1)
+
+    async def scenario():
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire("a"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert limiter.queue_depth == 0
+        limiter.release()
+        assert limiter.inflight == 0
+
+    asyncio.run(scenario())
+
+
+def test_errors_shrink_limit_down_to_minimum():
+    limiter = _limiter(limit=8, min_limit=2)
+    limiter.on_error()
+    assert limiter.limit == 4
+    limiter.on_error()
+    limiter.on_error()
+    assert limiter.limit == 2
+    assert limiter.errors == 3
+
+
+def test_saturated_fast_responses_grow_limit():
+    limiter = _limiter(limit=2)
+    limiter.inflight = 2
+    for _ in range(4):
+        limiter.on_success(0.1)
+    assert 2 < limiter.limit <= 8
+
+
+def test_latency_inflation_shrinks_limit():
+    limiter = _limiter(limit=4)
+    limiter.on_success(0.1)
+    for _ in range(20):
+        limiter.on_success(1.0)
+    assert limiter.limit < 4
@@ -0,0 +1,68 @@
+import asyncio
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.api.v1.base_model import Base
+from app.migrations import LATEST_VERSION, MIGRATIONS, migrate, schema_version
+
+
+def _run(db_path, *steps):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        try:
+            return [await step(engine) for step in steps]
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(scenario())
+
+
+async def _tables(engine) -> dict[str, set[str]]:
+    def read(conn):
+        inspector = inspect(conn)
+        return {t: {c["name"] for c in inspector.get_columns(t)} for t in inspector.get_table_names()}
+
+    async with engine.connect() as conn:
+        return await conn.run_sync(read)
+
+
+def test_empty_database_is_migrated_to_latest(tmp_path):
+    before, applied, after, tables = _run(tmp_path / "empty.db", schema_version, migrate, schema_version, _tables)
+    assert before == 0
+    assert applied == [f"{number:04d}_{name}" for number, name, _ in MIGRATIONS]
+    assert after == LATEST_VERSION
+    for table in Base.metadata.sorted_tables:
+        assert {c.name for c in table.columns} <= tables[table.name], table.name
+
+
+def test_upgrade_is_idempotent(tmp_path):
+    first, second, version = _run(tmp_path / "twice.db", migrate, migrate, schema_version)
+    assert first and second == []
+    assert version == LATEST_VERSION
+
+
+def test_pre_migration_database_is_upgraded(tmp_path):
+    async def legacy(engine):
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE TABLE incidents (iid INTEGER PRIMARY KEY, video_link VARCHAR(512) NOT NULL, "
+                "status VARCHAR(50) NOT NULL, inferred_domain VARCHAR(50) NOT NULL, has_event BOOLEAN NOT NULL, "
+                "duration_sec FLOAT NOT NULL, num_frames INTEGER NOT NULL, num_windows INTEGER NOT NULL, "
+                "model_version VARCHAR(50) NOT NULL, prompt_version VARCHAR(50) NOT NULL, analysis_json TEXT, "
+                "created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)"
+            ))
+            await conn.execute(text(
+                "INSERT INTO incidents (video_link, status, inferred_domain, has_event, duration_sec, num_frames, "
+                "num_windows, model_version, prompt_version) VALUES ('v.mp4', 'DONE', 'traffic', 1, 10, 250, 5, 'm', 'p')"
+            ))
+
+    async def tiers(engine):
+        async with engine.connect() as conn:
+            return (await conn.execute(text("SELECT media_tier FROM incidents"))).scalars().all()
+
+    _, applied, media_tiers, tables = _run(tmp_path / "legacy.db", legacy, migrate, tiers, _tables)
+    assert len(applied) == len(MIGRATIONS)
+    assert media_tiers == ["hot"]
+    assert {"processing_sec", "media_tier"} <= tables["incidents"]
+    assert "duration_sec" in tables["logs"]
@@ -0,0 +1,97 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.api.v1.services.resilience import CircuitBreaker, call_with_retry, is_retryable
+from app.config import settings
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "llm_retry_base_sec", 0.0)
+
+
+def _status_error(code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://llm/generate")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(code, request=request))
+
+
+class Flaky:
+    def __init__(self, *errors: BaseException):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_is_retryable():
+    assert is_retryable(_status_error(503))
+    assert is_retryable(_status_error(429))
+    assert is_retryable(httpx.ConnectError("refused"))
+    assert not is_retryable(_status_error(400))
+    assert not is_retryable(ValueError("bad json"))
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60.0)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_breaker_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+
+    async def scenario():
+        await breaker.wait_ready()
+        assert breaker.state == "half_open"
+        second = asyncio.create_task(breaker.wait_ready())
+        await asyncio.sleep(0.01)
+        assert not second.done()
+        breaker.record_success()
+        await asyncio.wait_for(second, 1.0)
+
+    asyncio.run(scenario())
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.0)
+    for _ in range(3):
+        breaker.record_failure()
+    asyncio.run(breaker.wait_ready())
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_retry_until_success():
+    fn = Flaky(_status_error(502), httpx.ReadTimeout("slow"))
+    breaker = CircuitBreaker(failure_threshold=10, reset_timeout=60.0)
+    assert asyncio.run(call_with_retry(fn, attempts=3, breaker=breaker)) == "ok"
+    assert fn.calls == 3
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_retry_gives_up_after_attempts():
+    fn = Flaky(*(_status_error(503) for _ in range(5)))
+    breaker = CircuitBreaker(failure_threshold=10, reset_timeout=60.0)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(call_with_retry(fn, attempts=2, breaker=breaker))
+    assert fn.calls == 2
+    assert breaker.failures == 2
+
+
+def test_client_errors_are_not_retried_and_keep_circuit_closed():
+    fn = Flaky(_status_error(422))
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60.0)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(call_with_retry(fn, attempts=3, breaker=breaker))
+    assert fn.calls == 1
+    assert breaker.state == "closed"
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+
+from app.api.v1.incidents.orm import Incident
+from app.api.v1.services.retention import OWNER_MARKER, RetentionSweeper, _owner_token, orphan_sweep_state, owned_path
+from app.config import settings
+from app.database import db
+from app.migrations import migrate
+
+HOT = settings.media_dir / "videos"
+
+
+def _incident(days: int, status: str = "DONE", has_event: bool = False, tier: str = "hot", link=None):
+    return Incident(
+        video_link=str(link or HOT / "video.mp4"),
+        status=status,
+        has_event=has_event,
+        media_tier=tier,
+        created_at=datetime.utcnow() - timedelta(days=days),
+    )
+
+
+def _matching(policies: list[dict], **incidents: Incident) -> list[list[str]]:
+    async def scenario():
+        try:
+            await migrate(db.engine)
+            async with db.session_factory() as session:
+                await session.execute(delete(Incident))
+                session.add_all(incidents.values())
+                await session.commit()
+                names = {incident.iid: name for name, incident in incidents.items()}
+            sweeper = RetentionSweeper(interval=3600)
+            return [[names[iid] for iid, _ in await sweeper._matching(policy)] for policy in policies]
+        finally:
+            await db.engine.dispose()
+
+    return asyncio.run(scenario())
+
+
+def test_policy_matches_by_age_status_and_event_flag():
+    matched = _matching(
+        [
+            {"older_than_days": 30, "action": "delete"},
+            {"older_than_days": 7, "status": "DONE", "has_event": False, "action": "delete"},
+        ],
+        old=_incident(40),
+        old_event=_incident(40, has_event=True),
+        week_error=_incident(10, status="ERROR"),
+        week_done=_incident(10),
+        fresh=_incident(1),
+    )
+    assert matched == [["old", "old_event"], ["old", "week_done"]]
+
+
+def test_policy_skips_active_foreign_and_already_moved_files():
+    matched = _matching(
+        [{"older_than_days": 1, "action": "cold"}, {"older_than_days": 1, "action": "delete"}],
+        processing=_incident(5, status="PROCESSING"),
+        ingest=_incident(5, link=settings.ingest_dir / "cam.mp4"),
+        stream=_incident(5, link="rtsp://cam/1"),
+        cold=_incident(5, tier="cold", link=settings.media_cold_dir / "cold.mp4"),
+        deleted=_incident(5, tier="deleted"),
+        hot=_incident(5),
+    )
+    assert matched == [["hot"], ["cold", "hot"]]
+
+
+def test_owned_path():
+    assert owned_path(str(HOT / "1.mp4")) == HOT / "1.mp4"
+    assert owned_path(str(settings.media_cold_dir / "1.mp4")) == settings.media_cold_dir / "1.mp4"
+    assert owned_path(str(settings.ingest_dir / "1.mp4")) is None
+    assert owned_path(None) is None
+
+
+def test_orphan_sweep_state(tmp_path):
+    assert orphan_sweep_state(tmp_path) == "disabled: no owner marker"
+    (tmp_path / OWNER_MARKER).write_text("someone-else")
+    assert orphan_sweep_state(tmp_path) == "disabled: owned by another database"
+    (tmp_path / OWNER_MARKER).write_text(_owner_token())
+    assert orphan_sweep_state(tmp_path) == "enabled"
@@ -0,0 +1,49 @@
+import numpy as np
+
+from app.api.v1.services.risk_curve import downsample, lttb, minmax
+
+
+def _curve(n: int = 200) -> tuple[np.ndarray, np.ndarray]:
+    x = np.arange(n, dtype=np.float64)
+    y = np.full(n, 0.1)
+    if n > 140:
+        y[57], y[140] = 0.95, 0.0
+    return x, y
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x, y = _curve()
+    idx = lttb(x, y, 20)
+    assert len(idx) == 20
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert {57, 140} <= set(idx.tolist())
+
+
+def test_lttb_returns_everything_when_not_reducing():
+    x, y = _curve(10)
+    assert lttb(x, y, 10).tolist() == list(range(10))
+    assert lttb(x, y, 2).tolist() == list(range(10))
+
+
+def test_minmax_keeps_bucket_extremes_in_order():
+    _, y = _curve()
+    idx = minmax(y, 20)
+    assert len(idx) <= 20
+    assert np.all(np.diff(idx) > 0)
+    assert {57, 140} <= set(idx.tolist())
+
+
+def test_minmax_returns_everything_when_not_reducing():
+    _, y = _curve(10)
+    assert minmax(y, 10).tolist() == list(range(10))
+    assert minmax(y, 1).tolist() == list(range(10))
+
+
+def test_downsample_returns_matching_points():
+    x, y = _curve()
+    for method in ("lttb", "minmax"):
+        xs, ys = downsample(x, y, 20, method=method)
+        assert len(xs) == len(ys) <= 20
+        assert np.array_equal(ys, y[xs.astype(int)])
+        assert ys.max() == 0.95 and ys.min() == 0.0
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight, digest
+
+
+def _value(value, delay: float = 0.01):
+    async def fn():
+        await asyncio.sleep(delay)
+        return value
+    return fn
+
+
+def test_digest_separates_parts():
+    assert digest("ab", "c") != digest("a", "bc")
+    assert digest("a", b"b") == digest(b"a", "b")
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def scenario():
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+        assert flight.inflight() == 0
+        return results
+
+    assert asyncio.run(scenario()) == [1] * 5
+    assert calls == 1
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight("test")
+
+    async def scenario():
+        return await asyncio.gather(flight.do("a", _value("a")), flight.do("b", _value("b")))
+
+    assert asyncio.run(scenario()) == ["a", "b"]
+
+
+def test_finished_call_is_not_reused():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async def scenario():
+        return [await flight.do("k", fetch), await flight.do("k", fetch)]
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("llm down")
+
+    async def scenario():
+        return await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_cancelling_one_waiter_keeps_the_call_for_others():
+    flight = SingleFlight("test")
+
+    async def scenario():
+        first = asyncio.create_task(flight.do("k", _value("v", delay=0.05)))
+        second = asyncio.create_task(flight.do("k", _value("other")))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "v"
+
+
+def test_call_is_cancelled_when_nobody_waits():
+    flight = SingleFlight("test")
+
+    async def scenario():
+        finished = []
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            finished.append(True)
+
+        waiter = asyncio.create_task(flight.do("k", slow))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0.08)
+        assert flight.inflight() == 0
+        return finished
+
+    assert asyncio.run(scenario()) == []